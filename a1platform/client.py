@@ -1,6 +1,11 @@
+import asyncio
+import copy
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import Callable, Literal, TypeVar
 
-from httpx import AsyncClient
+from httpx import Response
 
 from a1platform.exception import (
     PlatformException,
@@ -15,14 +20,47 @@ from a1platform.exception import (
 from a1platform.models import (
     CaptchaResponse,
     CaptchaSubmitResponse,
+    GameInfoResponse,
     LoginResponse,
-    ChallengeResponse,
-    ChallengeCache,
     NoticeResponse,
-    ScoreboardResponse,
+    parse_notices_after,
+)
+from a1platform.coalesce import SingleFlight
+from a1platform.conditional import ConditionalResponseCache
+from a1platform.refresher import CacheRefresher
+from a1platform.session import SessionManager
+from a1platform.transport import TransportConfig, build_client
+from a1platform.snapshot import (
+    ChallengeCache,
     ScoreboardCache,
+    ScoreboardSnapshot,
+    merge_snapshots,
+    next_version,
+    parse_challenge_page,
+    parse_scoreboard_page,
 )
 from utils.captcha import solve_challenge
+from utils.logger import log
+from utils.processes import process_context
+from utils.metrics import counter, gauge
+
+Parsed = TypeVar("Parsed")
+
+CACHE_REQUESTS = counter(
+    "platform_cache_requests_total",
+    "Scoreboard and challenge lookups by outcome; stale means a failed refresh served old data.",
+    ("cache", "game", "result"),
+)
+CACHE_AGE = gauge(
+    "platform_cache_age_seconds",
+    "Time since the cached data was last refreshed.",
+    ("cache", "game"),
+)
+CACHE_STALE = gauge(
+    "platform_cache_stale",
+    "1 when the last refresh of the cache failed.",
+    ("cache", "game"),
+)
 
 
 class PlatformClient:
@@ -34,6 +72,16 @@ class PlatformClient:
         password: str | None = None,
         cookie: str | None = None,
         cache_duration: int = 300,  # 5 mins
+        captcha_workers: int | None = None,  # None 表示使用全部 CPU 核心
+        refresh_mode: Literal["inline", "background"] = "inline",
+        scoreboard_refresh_interval: int | None = None,
+        challenges_refresh_interval: int | None = None,
+        scoreboard_page_size: int = 0,  # 0 表示一次性获取全部队伍
+        scoreboard_concurrency: int = 4,
+        parse_executor: Literal["inline", "thread", "process"] = "thread",
+        parse_offload_threshold: int = 64 * 1024,  # 小于该字节数的响应直接解析
+        notice_since_param: str | None = None,
+        transport: TransportConfig | None = None,
     ):
         if not all([username, password]) and not cookie:
             raise CredentialsNotSatisfiedException(
@@ -43,23 +91,81 @@ class PlatformClient:
             self.credential_set = True
         else:
             self.credential_set = False
-        self.client = AsyncClient(base_url=base_url)
-        self.game_id = game_id
+        # 超时、连接池、压缩与重试见 a1platform.transport
+        self.client = build_client(base_url, transport)
+        # 由 for_game 创建的实例共用同一个 AsyncClient，只有创建者负责关闭
+        self._owns_client = True
         self.username = username
         self.password = password
         self.cookie = cookie
+        if cookie:
+            self._apply_cookie(cookie)
+        self.session = SessionManager(
+            login=self._login_platform,
+            validate=self._check_cookie_valid,
+            can_login=self.credential_set,
+            has_cookie=bool(cookie),
+        )
+        self.cache_duration = cache_duration
+        self.scoreboard_page_size = scoreboard_page_size
+        self.scoreboard_concurrency = scoreboard_concurrency
+        # 大响应的 JSON 解析与校验放到线程/进程中执行，避免阻塞事件循环
+        self.parse_executor = parse_executor
+        self.parse_offload_threshold = parse_offload_threshold
+        self.captcha_workers = captcha_workers
+        # 平台支持按 notice_id 增量查询公告时使用的查询参数名
+        self.notice_since_param = notice_since_param
+        # background 模式下由后台任务在缓存过期前刷新，指令直接使用最近一次的快照
+        self.refresh_mode = refresh_mode
+        self.scoreboard_refresh_interval = scoreboard_refresh_interval
+        self.challenges_refresh_interval = challenges_refresh_interval
+        self._reset_game_state(game_id)
+
+    def _reset_game_state(self, game_id: int | str):
+        self.game_id = game_id
         self.challenges_cache: ChallengeCache = ChallengeCache(
             challenges=None, last_updated=None
         )
-        self.cache_duration = cache_duration
         self.scoreboard_cache: ScoreboardCache = ScoreboardCache(
             board=None, last_updated=None
         )
+        self._scoreboard_pages: list[ScoreboardSnapshot] = []
+        self._parse_pool: ProcessPoolExecutor | None = None
+        # 缓存过期时合并同一资源的并发刷新请求
+        self.single_flight = SingleFlight()
+        # 响应未变化时复用上次的解析结果，跳过 pydantic 校验
+        self.response_cache = ConditionalResponseCache()
+        self.refresher = CacheRefresher()
+        self.refresher.add(
+            "scoreboard",
+            self._refresh_scoreboard,
+            self.scoreboard_refresh_interval or self.cache_duration * 0.8,
+        )
+        self.refresher.add(
+            "challenges",
+            self._refresh_challenges,
+            self.challenges_refresh_interval or self.cache_duration * 0.8,
+        )
+
+    def for_game(self, game_id: int | str) -> "PlatformClient":
+        """
+        Returns a client for another game of the same platform. It shares
+        this client's connection pool and login session, and has its own
+        caches and background refresh.
+        """
+        other = copy.copy(self)
+        other._owns_client = False
+        other._reset_game_state(game_id)
+        return other
 
     @property
     def notice_url(self) -> str:
         return f"/api/game/{self.game_id}/notices"
 
+    @property
+    def game_info_url(self) -> str:
+        return f"/api/game/{self.game_id}"
+
     @property
     def challenge_url(self) -> str:
         return f"/api/game/{self.game_id}/challenges"
@@ -84,6 +190,9 @@ class PlatformClient:
     def rank_url(self) -> str:
         return f"/api/game/{self.game_id}/scoreboard?page=1&page_size=10000"
 
+    def scoreboard_url(self, page: int) -> str:
+        return f"/api/game/{self.game_id}/scoreboard?page={page}&page_size={self.scoreboard_page_size}"
+
     async def match_status(self, status_code: int, message: str | None = None):
         match status_code:
             case 200:
@@ -103,23 +212,99 @@ class PlatformClient:
             case _:
                 raise PlatformException(f"Unexpected response code: {status_code}")
 
+    def _apply_cookie(self, cookie: str):
+        # 支持 "a1token=xxx; other=yyy" 形式，或直接填写 a1token 的值
+        if "=" not in cookie:
+            self.client.cookies.set("a1token", cookie.strip())
+            return
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name:
+                self.client.cookies.set(name, value)
+
+    async def _get(
+        self,
+        url: str,
+        authenticated: bool = True,
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        """
+        Sends a GET request with a usable session. A 401 response invalidates
+        the session, triggers a re-login and retries the request once.
+        """
+        if authenticated:
+            await self.session.ensure()
+        generation = self.session.generation
+        resp = await self.client.get(url, headers=headers)
+        if resp.status_code == 401:
+            self.session.invalidate(generation)
+            await self.session.ensure()
+            resp = await self.client.get(url, headers=headers)
+        return resp
+
+    async def _parse(self, parse: Callable[[bytes], Parsed], content: bytes) -> Parsed:
+        if (
+            self.parse_executor == "inline"
+            or len(content) < self.parse_offload_threshold
+        ):
+            return parse(content)
+        if self.parse_executor == "process":
+            if self._parse_pool is None:
+                self._parse_pool = ProcessPoolExecutor(
+                    max_workers=1, mp_context=process_context()
+                )
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._parse_pool, parse, content)
+        return await asyncio.to_thread(parse, content)
+
+    async def close(self):
+        if self._owns_client:
+            await self.client.aclose()
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    async def _get_parsed(
+        self, url: str, parse: Callable[[bytes], Parsed], authenticated: bool = True
+    ) -> Parsed:
+        """
+        Fetches `url` conditionally and parses the body with `parse`, reusing
+        the previous result when the platform reports or returns unchanged
+        data. The parsed object must carry the platform's `code` field.
+        """
+        resp = await self._get(
+            url, authenticated, self.response_cache.conditional_headers(url)
+        )
+        parsed = self.response_cache.reuse(url, resp)
+        if parsed is not None:
+            return parsed
+        if resp.status_code != 200:
+            await self.match_status(resp.status_code)
+        parsed = await self._parse(parse, resp.content)
+        await self.match_status(parsed.code, getattr(parsed, "message", None))  # type: ignore
+        self.response_cache.store(url, resp, parsed)
+        return parsed
+
     async def _check_cookie_valid(self) -> bool:
         resp = await self.client.get(self.profile_url)
         if resp.status_code == 200:
             return True
         return False
 
-    async def _login_platform(self):
+    async def _login_platform(self) -> LoginResponse:
         if not self.credential_set:
             raise CredentialsNotSetException("Credentials are not set.")
         resp = await self.client.post(self.captcha_challenge_url)
         resp.raise_for_status()
         captcha_response = CaptchaResponse.model_validate_json(resp.content)
-        solutions = solve_challenge(
+        # 求解过程为 CPU 密集型，放到线程中执行以免阻塞事件循环
+        solutions = await asyncio.to_thread(
+            solve_challenge,
             captcha_response.token,
             captcha_response.challenge.c,
             captcha_response.challenge.s,
             captcha_response.challenge.d,
+            self.captcha_workers,
         )
         resp = await self.client.post(
             self.captcha_redeem_url,
@@ -142,41 +327,199 @@ class PlatformClient:
         if login_response.code != 200:
             raise LoginFailedException(f"Login failed: {login_response.message}")
         self.client.cookies.update({"a1token": login_response.token})  # type: ignore
+        return login_response
+
+    def collect_cache_metrics(self):
+        """Updates the age and staleness gauges of both caches."""
+        now = datetime.now()
+        for name, cache in (
+            ("scoreboard", self.scoreboard_cache),
+            ("challenges", self.challenges_cache),
+        ):
+            if cache.last_updated is not None:
+                age = (now - cache.last_updated).total_seconds()
+                CACHE_AGE.set(age, cache=name, game=self.game_id)
+            CACHE_STALE.set(int(cache.stale), cache=name, game=self.game_id)
+
+    def start_background_refresh(self):
+        if self.refresh_mode == "background":
+            self.refresher.start()
+
+    async def stop_background_refresh(self):
+        await self.refresher.stop()
 
     async def fetch_challenges(self):
-        if not await self._check_cookie_valid():
-            await self._login_platform()
-        if (
-            self.challenges_cache.last_updated
-            and (datetime.now() - self.challenges_cache.last_updated).total_seconds()
-            < self.cache_duration
+        cache = self.challenges_cache
+        if cache.challenges is not None and (
+            self.refresh_mode == "background"
+            or (
+                cache.last_updated
+                and (datetime.now() - cache.last_updated).total_seconds()
+                < self.cache_duration
+            )
         ):
-            return self.challenges_cache.challenges  # 在缓存期限内，不刷新
-        resp = await self.client.get(self.challenge_url)
-        await self.match_status(resp.status_code)
-        data = ChallengeResponse.model_validate_json(resp.content)
-        self.challenges_cache.challenges = data.data.challenges
+            CACHE_REQUESTS.inc(cache="challenges", game=self.game_id, result="hit")
+            return cache.challenges  # 在缓存期限内，或由后台任务负责刷新
+        CACHE_REQUESTS.inc(cache="challenges", game=self.game_id, result="miss")
+        try:
+            return await self._refresh_challenges()
+        except Exception as e:
+            if cache.challenges is None:
+                raise
+            log("[-] Failed to refresh challenges, serving stale data: %s", e)
+            CACHE_REQUESTS.inc(cache="challenges", game=self.game_id, result="stale")
+            return cache.challenges
+
+    async def _refresh_challenges(self):
+        try:
+            return await self.single_flight.do("challenges", self._load_challenges)
+        except Exception:
+            self.challenges_cache.stale = True
+            raise
+
+    async def _load_challenges(self):
+        page = await self._get_parsed(self.challenge_url, parse_challenge_page)
+        if page.data is not self.challenges_cache.challenges:
+            page.data.version = next_version()
+        self.challenges_cache.challenges = page.data
         self.challenges_cache.last_updated = datetime.now()
-        return data.data.challenges
+        self.challenges_cache.stale = False
+        return page.data
+
+    async def fetch_game_info(self):
+        resp = await self._get(self.game_info_url)
+        info = await self._parse(GameInfoResponse.model_validate_json, resp.content)
+        await self.match_status(info.code, info.message)
+        return info.data
 
-    async def fetch_notice(self):
-        if not await self._check_cookie_valid():
-            await self._login_platform()
-        resp = await self.client.get(self.notice_url)
-        notices = NoticeResponse.model_validate_json(resp.content)
+    async def fetch_notice(self, after: int | None = None):
+        """
+        Returns the game's notices. With `after`, only notices whose id is
+        above it are returned, and only those are validated.
+        """
+        if after is None:
+            resp = await self._get(self.notice_url)
+            notices = await self._parse(
+                NoticeResponse.model_validate_json, resp.content
+            )
+        else:
+            url = self.notice_url
+            if self.notice_since_param:
+                url = f"{url}?{self.notice_since_param}={after}"
+            resp = await self._get(url)
+            # 平台可能忽略该参数，因此仍在本地按 after 过滤
+            notices = await self._parse(
+                functools.partial(parse_notices_after, after=after), resp.content
+            )
         await self.match_status(notices.code, notices.message)
         return notices.data
 
-    async def fetch_scoreboard(self):
+    async def fetch_scoreboard(self, min_teams: int | None = None):
+        """
+        Returns the scoreboard. In paginated mode, `min_teams` allows stopping
+        after the pages that contain the first `min_teams` teams.
+        """
+        cache = self.scoreboard_cache
         if (
-            isinstance(self.scoreboard_cache.last_updated, datetime)
-            and (datetime.now() - self.scoreboard_cache.last_updated).total_seconds()
-            < self.cache_duration
+            cache.board is not None
+            and (
+                cache.complete
+                or (min_teams is not None and len(cache.board.teams) >= min_teams)
+            )
+            and (
+                self.refresh_mode == "background"
+                or (
+                    isinstance(cache.last_updated, datetime)
+                    and (datetime.now() - cache.last_updated).total_seconds()
+                    < self.cache_duration
+                )
+            )
         ):
-            return self.scoreboard_cache.board  # 在缓存期限内，不刷新
-        resp = await self.client.get(self.rank_url)
+            CACHE_REQUESTS.inc(cache="scoreboard", game=self.game_id, result="hit")
+            return cache.board  # 在缓存期限内，或由后台任务负责刷新
+        CACHE_REQUESTS.inc(cache="scoreboard", game=self.game_id, result="miss")
+        try:
+            return await self._refresh_scoreboard(min_teams)
+        except Exception as e:
+            if cache.board is None:
+                raise
+            log("[-] Failed to refresh scoreboard, serving stale data: %s", e)
+            CACHE_REQUESTS.inc(cache="scoreboard", game=self.game_id, result="stale")
+            return cache.board
+
+    async def _refresh_scoreboard(self, min_teams: int | None = None):
+        pages = None
+        if min_teams is not None and self.scoreboard_page_size:
+            pages = max(1, -(-min_teams // self.scoreboard_page_size))
+        # 完整刷新进行中时，部分请求直接等待它的结果
+        if pages is None or self.single_flight.in_flight("scoreboard"):
+            key, pages = "scoreboard", None
+        else:
+            key = f"scoreboard:{pages}"
+        try:
+            return await self.single_flight.do(
+                key, lambda: self._load_scoreboard(pages)
+            )
+        except Exception:
+            self.scoreboard_cache.stale = True
+            raise
+
+    async def _fetch_scoreboard_pages(
+        self, max_pages: int | None
+    ) -> list[ScoreboardSnapshot]:
+        first = await self._get_parsed(
+            self.scoreboard_url(1), parse_scoreboard_page, authenticated=False
+        )
+        if first.data is None:
+            raise PlatformException("Scoreboard response contains no data.")
+        last_page = first.data.pagination.total_pages
+        if max_pages is not None:
+            last_page = min(last_page, max_pages)
+        semaphore = asyncio.Semaphore(self.scoreboard_concurrency)
+
+        async def fetch_page(page: int) -> ScoreboardSnapshot:
+            async with semaphore:
+                resp = await self._get_parsed(
+                    self.scoreboard_url(page),
+                    parse_scoreboard_page,
+                    authenticated=False,
+                )
+            if resp.data is None:
+                raise PlatformException(f"Scoreboard page {page} contains no data.")
+            return resp.data
+
+        rest = await asyncio.gather(*(fetch_page(p) for p in range(2, last_page + 1)))
+        return [first.data, *rest]
+
+    async def _load_scoreboard(self, max_pages: int | None = None):
+        if not self.scoreboard_page_size:
+            scoreboard = await self._get_parsed(
+                self.rank_url, parse_scoreboard_page, authenticated=False
+            )
+            board = scoreboard.data
+            complete = True
+        else:
+            pages = await self._fetch_scoreboard_pages(max_pages)
+            if (
+                len(pages) == len(self._scoreboard_pages)
+                and self.scoreboard_cache.board is not None
+                and all(a is b for a, b in zip(pages, self._scoreboard_pages))
+            ):
+                board = self.scoreboard_cache.board  # 所有分页均未变化
+            else:
+                board = merge_snapshots(pages)
+            self._scoreboard_pages = pages
+            # 按取到的页数判断：合并时去重的跨页队伍会让队伍数少于 total_count
+            complete = max_pages is None or max_pages >= pages[0].pagination.total_pages
+        if board is not None and board is not self.scoreboard_cache.board:
+            board.version = next_version()
+            # 新快照的索引在线程中构建，避免阻塞事件循环
+            if self.parse_executor == "inline":
+                board.build_indexes()
+            else:
+                await asyncio.to_thread(board.build_indexes)
+        self.scoreboard_cache.board = board
+        self.scoreboard_cache.complete = complete
         self.scoreboard_cache.last_updated = datetime.now()
-        scoreboard = ScoreboardResponse.model_validate_json(resp.content)
-        await self.match_status(scoreboard.code, scoreboard.message)
-        self.scoreboard_cache.board = scoreboard.data
+        self.scoreboard_cache.stale = False
         return self.scoreboard_cache.board
@@ -0,0 +1,58 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, TypeVar
+
+from utils.metrics import counter
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = counter(
+    "platform_single_flight_total",
+    "Refresh calls by key; deduplicated calls awaited one already in flight.",
+    ("key", "result"),
+)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: while one call is in flight,
+    every other caller awaits the same task and receives its result (or its
+    exception) instead of starting another request.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.executed: Counter[str] = Counter()
+        self.deduplicated: Counter[str] = Counter()
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.executed[key] += 1
+            SINGLE_FLIGHT_CALLS.inc(key=key, result="executed")
+        else:
+            self.deduplicated[key] += 1
+            SINGLE_FLIGHT_CALLS.inc(key=key, result="deduplicated")
+        # shield: 某个调用方被取消时，其余调用方仍能拿到结果
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 异常已交给等待方处理，这里避免未读取的警告
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {
+            key: {
+                "executed": self.executed[key],
+                "deduplicated": self.deduplicated[key],
+            }
+            for key in self.executed.keys() | self.deduplicated.keys()
+        }
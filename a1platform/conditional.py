@@ -0,0 +1,101 @@
+import hashlib
+from typing import Any
+
+from httpx import Response
+from pydantic import BaseModel
+
+from a1platform.transport import endpoint_of
+from utils.metrics import counter
+
+PARSES = counter(
+    "platform_parse_total",
+    "Platform responses by whether they were parsed or the previous result was reused.",
+    ("endpoint", "result"),
+)
+
+
+class ParseStats(BaseModel):
+    parsed: int = 0
+    skipped_not_modified: int = 0  # 平台返回 304
+    skipped_unchanged: int = 0  # 响应内容的哈希与上次一致
+
+    @property
+    def skipped(self) -> int:
+        return self.skipped_not_modified + self.skipped_unchanged
+
+
+class _Entry:
+    __slots__ = ("etag", "last_modified", "content_hash", "parsed")
+
+    def __init__(
+        self,
+        etag: str | None,
+        last_modified: str | None,
+        content_hash: bytes,
+        parsed: Any,
+    ):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.parsed = parsed
+
+
+class ConditionalResponseCache:
+    """
+    Remembers the validators and the parsed result of the last successful
+    response per URL. Requests carry If-None-Match / If-Modified-Since when
+    the platform sent validators, and a response whose body hashes the same
+    as last time reuses the previous parsed object instead of validating it
+    again.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+        self.stats = ParseStats()
+
+    @staticmethod
+    def _hash(content: bytes) -> bytes:
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def reuse(self, url: str, resp: Response) -> Any | None:
+        """Returns the previous parsed object if `resp` carries nothing new."""
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if resp.status_code == 304:
+            self.stats.skipped_not_modified += 1
+            PARSES.inc(endpoint=_endpoint(url), result="not_modified")
+            return entry.parsed
+        if resp.status_code == 200 and self._hash(resp.content) == entry.content_hash:
+            self.stats.skipped_unchanged += 1
+            PARSES.inc(endpoint=_endpoint(url), result="unchanged")
+            return entry.parsed
+        return None
+
+    def store(self, url: str, resp: Response, parsed: Any):
+        self.stats.parsed += 1
+        PARSES.inc(endpoint=_endpoint(url), result="parsed")
+        self._entries[url] = _Entry(
+            resp.headers.get("ETag"),
+            resp.headers.get("Last-Modified"),
+            self._hash(resp.content),
+            parsed,
+        )
+
+    def forget(self, url: str):
+        self._entries.pop(url, None)
+
+
+def _endpoint(url: str) -> str:
+    return endpoint_of(url.partition("?")[0])
@@ -1,3 +1,4 @@
+import json
 from pydantic import BaseModel, Field, UUID4
 from typing import Literal, Optional
 from datetime import datetime, timezone
@@ -44,6 +45,37 @@ class NoticeResponse(BaseModel):
     data: Optional[list[Notice]] = None
 
 
+def parse_notices_after(content: bytes, after: int) -> NoticeResponse:
+    """
+    Parses a notice list, validating only the notices whose id is above
+    `after`. Older notices are dropped after the plain `json.loads`, so they
+    never go through pydantic.
+    """
+    raw = json.loads(content)
+    data = raw.get("data") if isinstance(raw, dict) else None
+    if isinstance(data, list):
+        raw["data"] = [
+            notice
+            for notice in data
+            if not isinstance(notice, dict)
+            or notice.get("notice_id", after + 1) > after
+        ]
+    return NoticeResponse.model_validate(raw)
+
+
+class GameInfo(BaseModel):
+    game_id: int
+    name: str = ""
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+
+
+class GameInfoResponse(BaseModel):
+    code: int
+    message: Optional[str] = None
+    data: Optional[GameInfo] = None
+
+
 class CaptchaChallenge(BaseModel):
     c: int
     d: int
@@ -84,11 +116,6 @@ class ChallengesData(BaseModel):
     challenges: list[Challenge]
 
 
-class ChallengeCache(BaseModel):
-    challenges: list[Challenge] | None
-    last_updated: datetime | None
-
-
 class ChallengeResponse(BaseModel):
     code: int
     data: ChallengesData
@@ -165,12 +192,39 @@ class ScoreboardData(BaseModel):
     pagination: ScoreboardPagination
 
 
+def merge_scoreboard_pages(pages: list[ScoreboardData]) -> ScoreboardData:
+    """
+    Merges scoreboard pages into a single ScoreboardData. Teams keep the page
+    order; a team that moved across a page boundary between two requests is
+    only kept once.
+    """
+    first = pages[0]
+    if len(pages) == 1:
+        return first
+    seen: set[int] = set()
+    teams: list[ScoreboardTeam] = []
+    team_timelines: list[ScoreboardTimeline] = []
+    for page in pages:
+        for team in page.teams:
+            if team.team_id not in seen:
+                seen.add(team.team_id)
+                teams.append(team)
+        team_timelines.extend(page.team_timelines)
+    return first.model_copy(
+        update={
+            "teams": teams,
+            "team_timelines": team_timelines,
+            "pagination": ScoreboardPagination(
+                current_page=1,
+                page_size=len(teams),
+                total_count=first.pagination.total_count,
+                total_pages=1,
+            ),
+        }
+    )
+
+
 class ScoreboardResponse(BaseModel):
     code: int
     message: Optional[str] = None
     data: Optional[ScoreboardData] = None
-
-
-class ScoreboardCache(BaseModel):
-    board: ScoreboardData | None
-    last_updated: datetime | None
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from utils.logger import log
+
+
+class CacheRefresher:
+    """
+    Refreshes platform caches from background tasks, one task per resource,
+    so that commands are always answered from the last good snapshot instead
+    of waiting for a refresh.
+    """
+
+    def __init__(self, error_retry_interval: float = 30):
+        self.error_retry_interval = error_retry_interval
+        self._resources: dict[str, tuple[Callable[[], Awaitable], float]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def add(self, name: str, refresh: Callable[[], Awaitable], interval: float):
+        self._resources[name] = (refresh, interval)
+
+    def start(self):
+        for name, (refresh, interval) in self._resources.items():
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(
+                    self._run(name, refresh, interval)
+                )
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, name: str, refresh: Callable[[], Awaitable], interval: float):
+        while True:
+            try:
+                await refresh()
+                delay = interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 平台不可用时保留旧快照，稍后重试
+                log("[-] Background refresh of %s failed: %s", name, e, level="warning")
+                delay = min(interval, self.error_retry_interval)
+            await asyncio.sleep(delay)
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from a1platform.exception import CredentialsNotSetException
+from a1platform.models import LoginResponse
+
+
+def parse_token_lifetime(expire: str) -> float | None:
+    """
+    Converts the `expire` field of a login response into the number of seconds
+    the token stays valid. Returns None when the value cannot be parsed.
+    """
+    try:
+        expire_at = datetime.fromisoformat(expire)
+    except (TypeError, ValueError):
+        return None
+    if expire_at.tzinfo is None:
+        expire_at = expire_at.replace(tzinfo=timezone.utc)
+    return (expire_at - datetime.now(timezone.utc)).total_seconds()
+
+
+class SessionManager:
+    """
+    Keeps track of whether the platform token is usable, so that requests do
+    not have to validate it with a profile round-trip every time.
+
+    The token is considered good until `refresh_margin` seconds before it
+    expires, or until a request reports 401 through `invalidate`. Callers
+    that find the token unusable share a single in-flight login.
+    """
+
+    def __init__(
+        self,
+        login: Callable[[], Awaitable[LoginResponse]],
+        validate: Callable[[], Awaitable[bool]],
+        can_login: bool,
+        has_cookie: bool,
+        refresh_margin: float = 60,
+        default_lifetime: float = 3600,
+        cookie_retry_interval: float = 5,
+    ):
+        self._login = login
+        self._validate = validate
+        self.can_login = can_login
+        self.has_cookie = has_cookie
+        self.refresh_margin = refresh_margin
+        self.default_lifetime = default_lifetime
+        self.cookie_retry_interval = cookie_retry_interval
+        self.generation = 0  # 每次成功登录/校验后递增
+        self.logins = 0
+        self._valid = False
+        self._expires_at: float | None = None  # monotonic 时间，None 表示未知
+        self._cookie_checked = False
+        # 仅 Cookie 模式下最近一次校验失败的 monotonic 时间
+        self._cookie_failed_at: float | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def is_valid(self) -> bool:
+        if not self._valid:
+            return False
+        if self._expires_at is None:
+            return True
+        return time.monotonic() < self._expires_at - self.refresh_margin
+
+    @property
+    def expires_in(self) -> float | None:
+        if not self._valid or self._expires_at is None:
+            return None
+        return self._expires_at - time.monotonic()
+
+    def invalidate(self, generation: int | None = None):
+        """
+        Marks the token as unusable. When `generation` is given, the call is
+        ignored if the session has been refreshed since that generation, so a
+        late 401 does not throw away a token obtained in the meantime.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        self._valid = False
+
+    async def ensure(self):
+        if self.is_valid:
+            return
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._clear_refresh_task)
+        # shield: 单个调用方被取消时不影响其他等待同一次登录的调用方
+        await asyncio.shield(self._refresh_task)
+
+    def _clear_refresh_task(self, task: asyncio.Task):
+        if self._refresh_task is task:
+            self._refresh_task = None
+        if not task.cancelled():
+            task.exception()  # 异常已交给等待方处理，这里避免未读取的警告
+
+    def _mark_valid(self, lifetime: float | None):
+        self._valid = True
+        self._expires_at = None if lifetime is None else time.monotonic() + lifetime
+        self.generation += 1
+
+    async def _refresh(self):
+        # 首次使用时先尝试配置的 Cookie，有效则无需求解验证码登录；
+        # 无法登录时 Cookie 是唯一的凭据，每次刷新都重新校验（失败后短暂退避）
+        if self.has_cookie and (not self._cookie_checked or not self.can_login):
+            if (
+                not self.can_login
+                and self._cookie_failed_at is not None
+                and time.monotonic() - self._cookie_failed_at
+                < self.cookie_retry_interval
+            ):
+                raise CredentialsNotSetException(
+                    "The cookie was rejected and credentials are not set."
+                )
+            valid = await self._validate()
+            self._cookie_checked = True
+            if valid:
+                self._cookie_failed_at = None
+                self._mark_valid(None)
+                return
+            self._cookie_failed_at = time.monotonic()
+        if not self.can_login:
+            raise CredentialsNotSetException(
+                "The cookie was rejected and credentials are not set."
+            )
+        login_response = await self._login()
+        self.logins += 1
+        lifetime = parse_token_lifetime(login_response.expire)
+        self._mark_valid(lifetime if lifetime is not None else self.default_lifetime)
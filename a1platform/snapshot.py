@@ -0,0 +1,492 @@
+import itertools
+import zlib
+from datetime import datetime
+from functools import cached_property
+from typing import TypedDict
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+
+from a1platform.models import (
+    Challenge,
+    ChallengeResponse,
+    ScoreboardData,
+    ScoreboardPagination,
+    ScoreboardResponse,
+    merge_scoreboard_pages,
+)
+from utils.ngram import NgramIndex
+
+
+class _SolveDict(TypedDict):
+    challenge_id: int
+    challenge_name: str
+    score: int
+    rank: int
+
+
+class _TeamDict(TypedDict):
+    team_id: int
+    team_name: str
+    rank: int
+    score: int
+    group_name: str | None
+    solved_challenges: list[_SolveDict]
+
+
+class _PaginationDict(TypedDict):
+    current_page: int
+    page_size: int
+    total_count: int
+    total_pages: int
+
+
+class _ScoreboardDict(TypedDict):
+    game_id: int
+    name: str
+    teams: list[_TeamDict]
+    challenges: list[Challenge]
+    groups: list[str]
+    pagination: _PaginationDict
+
+
+class _ScoreboardResponseDict(TypedDict, total=False):
+    code: int
+    message: str | None
+    data: _ScoreboardDict | None
+
+
+# 每个快照对象的版本号，内容未变化时复用旧快照，版本号也不变。
+# 快照可能在解析子进程中创建，因此版本号由主进程在存入缓存时分配（见 next_version）
+_VERSIONS = itertools.count(1)
+
+
+def next_version() -> int:
+    return next(_VERSIONS)
+
+
+# 只声明指令用得到的字段，其余字段（成员、时间线等）在解析时直接跳过
+_COMPACT_ADAPTER = TypeAdapter(_ScoreboardResponseDict)
+
+
+class SolveRecord:
+    __slots__ = ("challenge_id", "challenge_name", "score", "rank")
+
+    def __init__(self, challenge_id: int, challenge_name: str, score: int, rank: int):
+        self.challenge_id = challenge_id
+        self.challenge_name = challenge_name
+        self.score = score
+        self.rank = rank
+
+
+class TeamRecord:
+    __slots__ = (
+        "team_id",
+        "team_name",
+        "rank",
+        "score",
+        "group_name",
+        "solved_challenges",
+    )
+
+    def __init__(
+        self,
+        team_id: int,
+        team_name: str,
+        rank: int,
+        score: int,
+        group_name: str | None,
+        solved_challenges: tuple[SolveRecord, ...],
+    ):
+        self.team_id = team_id
+        self.team_name = team_name
+        self.rank = rank
+        self.score = score
+        self.group_name = group_name
+        self.solved_challenges = solved_challenges
+
+
+class ScoreboardSnapshot:
+    """
+    Compact scoreboard kept in the cache. Only the fields used by commands
+    are stored, in slotted records; the compressed response bodies are kept
+    so that the full ScoreboardData can still be built on demand.
+    """
+
+    def __init__(
+        self,
+        game_id: int,
+        name: str,
+        teams: list[TeamRecord],
+        challenges: list[Challenge],
+        groups: list[str],
+        pagination: ScoreboardPagination,
+        raw_pages: list[bytes],
+    ):
+        self.game_id = game_id
+        self.name = name
+        self.teams = teams
+        self.challenges = challenges
+        self.groups = groups
+        self.pagination = pagination
+        self._raw_pages = raw_pages
+        self.version = 0  # 存入缓存时分配
+
+    # 查找索引在每次刷新后构建一次（见 build_indexes），所有指令共用
+    @cached_property
+    def team_by_id(self) -> dict[int, TeamRecord]:
+        index: dict[int, TeamRecord] = {}
+        for team in self.teams:
+            index.setdefault(team.team_id, team)
+        return index
+
+    @cached_property
+    def team_by_name(self) -> dict[str, TeamRecord]:
+        # 同名（忽略大小写）时保留排名靠前的队伍
+        index: dict[str, TeamRecord] = {}
+        for team in self.teams:
+            index.setdefault(team.team_name.casefold(), team)
+        return index
+
+    @cached_property
+    def team_search(self) -> NgramIndex[TeamRecord]:
+        return NgramIndex((team.team_name, team) for team in self.teams)
+
+    def build_indexes(self):
+        self.team_by_id
+        self.team_by_name
+        self.team_search
+
+    def find_team(self, name: str) -> TeamRecord | None:
+        return self.team_by_name.get(name.strip().casefold())
+
+    def suggest_teams(self, name: str, limit: int = 5) -> list[TeamRecord]:
+        return self.team_search.fuzzy(name, limit)
+
+    @classmethod
+    def from_dict(cls, data: _ScoreboardDict, raw: bytes) -> "ScoreboardSnapshot":
+        teams = [
+            TeamRecord(
+                team["team_id"],
+                team["team_name"],
+                team["rank"],
+                team["score"],
+                team["group_name"],
+                tuple(
+                    SolveRecord(
+                        solve["challenge_id"],
+                        solve["challenge_name"],
+                        solve["score"],
+                        solve["rank"],
+                    )
+                    for solve in team["solved_challenges"]
+                ),
+            )
+            for team in data["teams"]
+        ]
+        return cls(
+            data["game_id"],
+            data["name"],
+            teams,
+            data["challenges"],
+            data["groups"],
+            ScoreboardPagination(**data["pagination"]),
+            [zlib.compress(raw, 1)],
+        )
+
+    def materialize(self) -> ScoreboardData:
+        """Builds the full pydantic model from the stored response bodies."""
+        pages = []
+        for raw in self._raw_pages:
+            response = ScoreboardResponse.model_validate_json(zlib.decompress(raw))
+            if response.data is not None:
+                pages.append(response.data)
+        return merge_scoreboard_pages(pages)
+
+
+class ChallengeSnapshot:
+    """Challenge list of one refresh, with a challenge_id index."""
+
+    def __init__(self, challenges: list[Challenge]):
+        self.challenges = challenges
+        self.by_id: dict[int, Challenge] = {c.challenge_id: c for c in challenges}
+        self.name_search = NgramIndex((c.challenge_name, c) for c in challenges)
+        self.version = 0  # 存入缓存时分配
+
+    def __iter__(self):
+        return iter(self.challenges)
+
+    def __len__(self) -> int:
+        return len(self.challenges)
+
+    def category_of(self, challenge_id: int, default: str = "未知类别") -> str:
+        challenge = self.by_id.get(challenge_id)
+        return challenge.category if challenge else default
+
+    def search(self, keyword: str) -> list[Challenge]:
+        return self.name_search.substring(keyword)
+
+    def suggest(self, keyword: str, limit: int = 5) -> list[Challenge]:
+        return self.name_search.fuzzy(keyword, limit)
+
+
+class ChallengePage:
+    """Result of parsing a challenge list response into a snapshot."""
+
+    __slots__ = ("code", "message", "data")
+
+    def __init__(self, code: int, data: ChallengeSnapshot):
+        self.code = code
+        self.message = None
+        self.data = data
+
+
+def parse_challenge_page(content: bytes) -> ChallengePage:
+    response = ChallengeResponse.model_validate_json(content)
+    return ChallengePage(response.code, ChallengeSnapshot(response.data.challenges))
+
+
+class ChallengeCache(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    challenges: ChallengeSnapshot | None
+    last_updated: datetime | None
+    stale: bool = False  # 最近一次刷新失败，当前为旧数据
+
+
+class ScoreboardCache(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    board: ScoreboardSnapshot | None
+    last_updated: datetime | None
+    stale: bool = False  # 最近一次刷新失败，当前为旧数据
+    complete: bool = True  # 分页模式下是否已获取全部队伍
+
+
+class ScoreboardPage:
+    """Result of parsing one scoreboard response into a snapshot."""
+
+    __slots__ = ("code", "message", "data")
+
+    def __init__(self, code: int, message: str | None, data: ScoreboardSnapshot | None):
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def parse_scoreboard_page(content: bytes) -> ScoreboardPage:
+    response = _COMPACT_ADAPTER.validate_json(content)
+    data = response.get("data")
+    return ScoreboardPage(
+        response.get("code", 0),
+        response.get("message"),
+        ScoreboardSnapshot.from_dict(data, content) if data else None,
+    )
+
+
+def merge_snapshots(pages: list[ScoreboardSnapshot]) -> ScoreboardSnapshot:
+    """Same as merge_scoreboard_pages, for compact snapshots."""
+    first = pages[0]
+    if len(pages) == 1:
+        return first
+    seen: set[int] = set()
+    teams: list[TeamRecord] = []
+    raw_pages: list[bytes] = []
+    for page in pages:
+        for team in page.teams:
+            if team.team_id not in seen:
+                seen.add(team.team_id)
+                teams.append(team)
+        raw_pages.extend(page._raw_pages)
+    return ScoreboardSnapshot(
+        first.game_id,
+        first.name,
+        teams,
+        first.challenges,
+        first.groups,
+        ScoreboardPagination(
+            current_page=1,
+            page_size=len(teams),
+            total_count=first.pagination.total_count,
+            total_pages=1,
+        ),
+        raw_pages,
+    )
+
+
+def _synthetic_scoreboard(teams: int, challenges: int, solves: int = 10) -> bytes:
+    """Generates a scoreboard response body shaped like the platform's."""
+    import json
+    import uuid
+
+    challenge_list = [
+        {
+            "challenge_id": c,
+            "challenge_name": f"challenge-{c}",
+            "total_score": 500,
+            "cur_score": 400,
+            "solve_count": 10,
+            "category": ("Web", "Pwn", "Crypto", "Reverse", "Misc")[c % 5],
+            "visible": True,
+            "belong_stage": "",
+        }
+        for c in range(1, challenges + 1)
+    ]
+    team_list = []
+    for i in range(1, teams + 1):
+        solved = [
+            {
+                "challenge_id": (i + k) % challenges + 1,
+                "score": 400,
+                "solver": f"player-{i}",
+                "rank": k + 1,
+                "solve_time": "2025-08-15T02:00:16Z",
+                "blood_reward": 0,
+                "challenge_name": f"challenge-{(i + k) % challenges + 1}",
+            }
+            for k in range(min(solves, challenges))
+        ]
+        team_list.append(
+            {
+                "team_id": i,
+                "team_name": f"Team {i}",
+                "team_avatar": None,
+                "team_slogan": "slogan " * 4,
+                "team_members": [
+                    {
+                        "avatar": None,
+                        "user_name": f"player-{i}-{m}",
+                        "user_id": str(uuid.UUID(int=i * 4 + m, version=4)),
+                        "captain": m == 0,
+                    }
+                    for m in range(4)
+                ],
+                "team_description": "description " * 4,
+                "rank": i,
+                "score": 400 * len(solved),
+                "penalty": 0,
+                "group_id": None,
+                "group_name": None,
+                "solved_challenges": solved,
+                "score_adjustments": [],
+                "last_solve_time": 0,
+            }
+        )
+    timeline = [
+        {
+            "team_id": t["team_id"],
+            "team_name": t["team_name"],
+            "scores": [
+                {"record_time": "2025-08-15T02:00:16Z", "score": 400 * k}
+                for k in range(solves)
+            ],
+        }
+        for t in team_list[:10]
+    ]
+    return json.dumps(
+        {
+            "code": 200,
+            "data": {
+                "game_id": 1,
+                "name": "benchmark",
+                "top10_timelines": timeline,
+                "teams": team_list,
+                "team_timelines": timeline,
+                "challenges": challenge_list,
+                "groups": [],
+                "pagination": {
+                    "current_page": 1,
+                    "page_size": teams,
+                    "total_count": teams,
+                    "total_pages": 1,
+                },
+            },
+        }
+    ).encode()
+
+
+def _benchmark_memory(team_counts: list[int]):
+    import time
+    import tracemalloc
+
+    for team_count in team_counts or [1000, 10000, 30000]:
+        body = _synthetic_scoreboard(team_count, 100)
+        print(f"{team_count} teams, body {len(body) / 1024 / 1024:.1f} MiB")
+        for name, parse in (
+            ("ScoreboardResponse", ScoreboardResponse.model_validate_json),
+            ("ScoreboardSnapshot", parse_scoreboard_page),
+        ):
+            started = time.perf_counter()
+            parse(body)
+            elapsed = time.perf_counter() - started
+            tracemalloc.start()
+            result = parse(body)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"  {name:<19} parse {elapsed:6.3f} s  "
+                f"retained {retained / 1024 / 1024:7.1f} MiB  "
+                f"peak {peak / 1024 / 1024:7.1f} MiB"
+            )
+            del result
+
+
+def _benchmark_index(team_count: int = 10000, challenge_count: int = 100):
+    import random
+    import time
+
+    page = parse_scoreboard_page(_synthetic_scoreboard(team_count, challenge_count))
+    board = page.data
+    assert board is not None
+    challenges = ChallengeSnapshot(board.challenges)
+    names = [
+        board.teams[random.randrange(team_count)].team_name.upper() for _ in range(200)
+    ]
+
+    def scan(name: str):
+        team = next(
+            (t for t in board.teams if t.team_name.lower() == name.lower()), None
+        )
+        assert team is not None
+        return [
+            next(
+                (
+                    c.category
+                    for c in challenges.challenges
+                    if c.challenge_id == s.challenge_id
+                ),
+                "未知类别",
+            )
+            for s in team.solved_challenges
+        ]
+
+    def indexed(name: str):
+        team = board.find_team(name)
+        assert team is not None
+        return [challenges.category_of(s.challenge_id) for s in team.solved_challenges]
+
+    started = time.perf_counter()
+    board.team_by_id
+    board.team_by_name
+    ChallengeSnapshot(board.challenges)
+    print(
+        f"{team_count} teams, {challenge_count} challenges: "
+        f"index build {(time.perf_counter() - started) * 1000:.2f} ms"
+    )
+    for label, lookup in (("linear scan", scan), ("index", indexed)):
+        started = time.perf_counter()
+        for name in names:
+            lookup(name)
+        per_query = (time.perf_counter() - started) / len(names)
+        print(f"  {label:<12} {per_query * 1e6:10.1f} us/query")
+
+
+if __name__ == "__main__":
+    # 用法: python -m a1platform.snapshot memory [队伍数 ...]
+    #       python -m a1platform.snapshot index [队伍数] [题目数]
+    import sys
+
+    args = sys.argv[1:]
+    if args and args[0] == "index":
+        _benchmark_index(*(int(arg) for arg in args[1:3]))
+    else:
+        _benchmark_memory([int(arg) for arg in args[1:] if arg.isdigit()])
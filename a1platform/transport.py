@@ -0,0 +1,159 @@
+import asyncio
+import random
+import re
+import time
+from importlib.util import find_spec
+
+import httpx
+from pydantic import BaseModel
+
+from utils.logger import log
+from utils.metrics import counter, histogram
+
+PLATFORM_REQUEST_LATENCY = histogram(
+    "platform_request_seconds",
+    "Time to fetch a platform response, body included, per attempt.",
+    ("endpoint", "method"),
+)
+PLATFORM_REQUESTS = counter(
+    "platform_requests_total",
+    "Platform requests by endpoint and outcome.",
+    ("endpoint", "method", "status"),
+)
+PLATFORM_RETRIES = counter(
+    "platform_request_retries_total",
+    "Platform requests retried after a transient failure.",
+    ("endpoint",),
+)
+
+# 幂等请求才会重试
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_of(path: str) -> str:
+    """Collapses numeric path segments so that every game shares a label."""
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+class TransportConfig(BaseModel):
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    # 需要安装 h2，未安装时回退到 HTTP/1.1
+    http2: bool = False
+    retries: int = 2
+    retry_backoff: float = 0.5
+    retry_max_backoff: float = 8.0
+
+
+class RetryingTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport to retry idempotent requests that failed with a
+    connection error, a timeout or a transient status, with exponential
+    backoff and jitter. The body is read inside the attempt so that the
+    recorded latency covers the download and a stalled body is retried too.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, config: TransportConfig):
+        self.inner = inner
+        self.config = config
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(
+            self.config.retry_max_backoff, self.config.retry_backoff * 2**attempt
+        )
+        return random.uniform(0, ceiling)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = endpoint_of(request.url.path)
+        method = request.method
+        retries = self.config.retries if method in RETRY_METHODS else 0
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.inner.handle_async_request(request)
+                if response.status_code in RETRY_STATUSES and attempt < retries:
+                    await response.aclose()
+                    status = str(response.status_code)
+                else:
+                    await response.aread()
+                    PLATFORM_REQUEST_LATENCY.observe(
+                        time.perf_counter() - started, endpoint=endpoint, method=method
+                    )
+                    PLATFORM_REQUESTS.inc(
+                        endpoint=endpoint, method=method, status=response.status_code
+                    )
+                    return response
+            except httpx.TransportError as e:
+                status = type(e).__name__
+                if attempt >= retries:
+                    PLATFORM_REQUESTS.inc(
+                        endpoint=endpoint, method=method, status=status
+                    )
+                    raise
+            PLATFORM_REQUEST_LATENCY.observe(
+                time.perf_counter() - started, endpoint=endpoint, method=method
+            )
+            PLATFORM_REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+            PLATFORM_RETRIES.inc(endpoint=endpoint)
+            delay = self._backoff(attempt)
+            log(
+                "[-] %s %s failed (%s), retrying in %.2fs",
+                method,
+                endpoint,
+                status,
+                delay,
+                level="warning",
+            )
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def accept_encoding() -> str:
+    # httpx 只有在安装了 brotli 时才能解码 br
+    if find_spec("brotli") or find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+def build_client(
+    base_url: str, config: TransportConfig | None = None
+) -> httpx.AsyncClient:
+    config = config or TransportConfig()
+    http2 = config.http2
+    if http2 and not find_spec("h2"):
+        log(
+            "[-] HTTP/2 requested but h2 is not installed, using HTTP/1.1",
+            level="warning",
+        )
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    transport = RetryingTransport(
+        httpx.AsyncHTTPTransport(http2=http2, limits=limits), config
+    )
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(
+            connect=config.connect_timeout,
+            read=config.read_timeout,
+            write=config.write_timeout,
+            pool=config.pool_timeout,
+        ),
+        headers={"Accept-Encoding": accept_encoding()},
+        transport=transport,
+    )
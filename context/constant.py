@@ -17,6 +17,10 @@ HELP_MSG = """
    > 查询特定队伍的得分与进度
    > !!team Volcano (查询队伍「Volcano」的状态)
 
+🎯 [多比赛]
+   > 在参数前加上 @比赛ID 查询指定比赛，如 !!rank @3 5
+   > 不指定时使用本群默认的比赛
+
 ⚠️ 数据具有五分钟缓存，请勿频繁查询
 
 💡 [关于系统]
@@ -1,57 +1,144 @@
-import json
+import asyncio
 import random
+import time
 from typing import Any, Literal
 from string import ascii_letters, digits
 
 from fastapi import WebSocket
 
-from napcat.models import GetStatusResponse
-from napcat.exception import ClientIsClosedException
+from napcat.dedup import EventDeduplicator
+from napcat.models import (
+    GetGroupListResponse,
+    GetStatusResponse,
+    SendGroupMsgResponse,
+)
+from napcat.exception import (
+    ActionTimeoutException,
+    ClientIsClosedException,
+    SendMsgFailedException,
+)
+from utils.logger import log
+from utils.metrics import counter, gauge, histogram
 
-COMMANDS = Literal["send_group_msg", "get_status"]
+COMMANDS = Literal["send_group_msg", "get_status", "get_group_list"]
 
 CHARSETS = ascii_letters + digits
 
+ACTION_LATENCY = histogram(
+    "napcat_action_seconds",
+    "Time between sending a Napcat action and receiving its response.",
+    ("action",),
+)
+ACTION_FAILURES = counter(
+    "napcat_action_failures_total",
+    "Napcat actions that timed out or returned an error.",
+    ("action", "reason"),
+)
+CONNECTIONS = gauge("napcat_connections", "Napcat connections currently registered.")
+DROPPED_EVENTS = counter(
+    "napcat_dropped_events_total",
+    "Inbound events dropped because the event buffer of a connection was full.",
+)
 
-class NapcatWebsocketServer:
-    def __init__(self):
-        self.connection: WebSocket | None = None
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.connection = websocket
+class NapcatConnection:
+    """
+    One websocket connection from a Napcat instance, i.e. one QQ account.
+
+    A reader task started by `start` is the only consumer of the socket. It
+    hands action responses to the waiting `_send_command` right away and
+    buffers events for `receive_json`, so a slow event consumer never delays
+    responses. Once `event_buffer` events are waiting, new events are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        self_id: int | None,
+        action_timeout: float,
+        event_buffer: int = 1024,
+    ):
+        self.connection: WebSocket | None = websocket
+        self.self_id = self_id
+        self.action_timeout = action_timeout
+        self.event_buffer = event_buffer
+        # 该账号所在的群，连接后通过 get_group_list 获取，并由收到的事件补充
+        self.groups: set[int] = set()
+        self.healthy = True
+        self.in_flight = 0
+        # 已发送但尚未收到响应的请求，按 echo 关联
+        self._pending: dict[str, asyncio.Future[dict[str, Any]]] = {}
+        # 读取任务交给 receive_json 的事件；连接出错时放入该异常
+        self._events: asyncio.Queue[dict[str, Any] | BaseException] = asyncio.Queue()
+        self._reader: asyncio.Task | None = None
+
+    def start(self):
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+    def can_reach(self, group_id: int) -> bool:
+        return group_id in self.groups
 
     async def disconnect(self):
+        self.stop()
         if isinstance(self.connection, WebSocket):
             await self.connection.close()
             self.connection = None
+        self._fail_pending("Websocket connection is closed.")
 
-    async def receive(self) -> dict:  # type: ignore
-        if self.connection is None:
-            raise ClientIsClosedException("Websocket connection is not established.")
-        data = await self.connection.receive_json()
-        return json.loads(data)
+    def _fail_pending(self, reason: str):
+        self.healthy = False
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ClientIsClosedException(reason))
+        self._pending.clear()
 
-    async def _send_command(self, command: COMMANDS, payload: dict[str, Any]):
+    async def _send_command(
+        self, command: COMMANDS, payload: dict[str, Any], timeout: float | None = None
+    ) -> dict[str, Any]:
         if self.connection is None:
             raise ClientIsClosedException("Websocket connection is not established.")
-        await self.connection.send_json(
-            {
-                "action": command,
-                "params": payload,
-                "echo": "".join(random.choices(CHARSETS, k=16)),
-            },
-        )
+        echo = "".join(random.choices(CHARSETS, k=16))
+        future = asyncio.get_running_loop().create_future()
+        self._pending[echo] = future
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.connection.send_json(
+                {
+                    "action": command,
+                    "params": payload,
+                    "echo": echo,
+                },
+            )
+            # 响应由读取任务按 echo 交付
+            return await asyncio.wait_for(future, timeout or self.action_timeout)
+        except TimeoutError:
+            ACTION_FAILURES.inc(action=command, reason="timeout")
+            self.healthy = False
+            raise ActionTimeoutException(
+                f"No response to {command} within {timeout or self.action_timeout}s."
+            )
+        finally:
+            self.in_flight -= 1
+            self._pending.pop(echo, None)
+            ACTION_LATENCY.observe(time.perf_counter() - started, action=command)
 
     async def send_group_msg(
         self,
         group_id: int,
         message: str | None = None,
         raw_message: list[dict[str, Any]] | None = None,
-    ):
+    ) -> SendGroupMsgResponse:
         if not message and not raw_message:
             raise ValueError("Either 'message' or 'raw_message' must be provided.")
-        await self._send_command(
+        resp = await self._send_command(
             "send_group_msg",
             {
                 "group_id": group_id,
@@ -62,15 +149,188 @@ class NapcatWebsocketServer:
                 ),
             },
         )
+        data = SendGroupMsgResponse.model_validate(resp)
+        if data.status != "ok":
+            ACTION_FAILURES.inc(action="send_group_msg", reason="error")
+            raise SendMsgFailedException(
+                f"Failed to send message to group {group_id}: {data.wording or data.message}"
+            )
+        return data
+
+    async def get_status(self) -> GetStatusResponse:
+        resp = await self._send_command("get_status", {})
+        return GetStatusResponse.model_validate(resp)
 
-    async def get_status(self):
-        await self._send_command("get_status", {})
-        resp = await self.connection.receive_json()  # type: ignore
-        data = GetStatusResponse.model_validate_json(json.dumps(resp))
-        return data.status == "ok"
+    async def refresh_groups(self) -> set[int]:
+        resp = GetGroupListResponse.model_validate(
+            await self._send_command("get_group_list", {})
+        )
+        if resp.status == "ok" and resp.data is not None:
+            self.groups = {group.group_id for group in resp.data}
+        return self.groups
+
+    async def _read(self):
+        while True:
+            if self.connection is None:
+                error: BaseException = ClientIsClosedException(
+                    "Websocket connection is not established."
+                )
+                self._events.put_nowait(error)
+                return
+            try:
+                data = await self.connection.receive_json()
+            except Exception as e:
+                self._fail_pending("Websocket connection is closed.")
+                self._events.put_nowait(e)
+                return
+            if self.self_id is None and "self_id" in data:
+                self.self_id = data["self_id"]
+            future = self._pending.get(data.get("echo"))  # type: ignore
+            if future is not None:
+                # 只有动作得到响应才说明连接恢复，心跳等事件不算
+                self.healthy = True
+                if not future.done():
+                    future.set_result(data)
+                continue
+            if "group_id" in data:
+                self.groups.add(data["group_id"])
+            if self._events.qsize() >= self.event_buffer:
+                # 不能在此等待消费者，否则动作的响应也会被阻塞
+                DROPPED_EVENTS.inc()
+                continue
+            self._events.put_nowait(data)
 
     async def receive_json(self) -> dict[str, Any]:
-        if self.connection is None:
+        """
+        Returns the next event from Napcat. Responses to actions sent through
+        `_send_command` never go through here, and an error of the connection
+        is raised once the events received before it have been returned.
+        """
+        self.start()
+        item = await self._events.get()
+        if isinstance(item, BaseException):
+            # 之后的调用仍然抛出同一个异常
+            self._events.put_nowait(item)
+            raise item
+        return item
+
+
+class NapcatWebsocketServer:
+    """
+    Registry of Napcat connections, one per QQ account (self_id). Group
+    messages go out through the least-loaded healthy account that is in the
+    target group, unless the caller asks for a specific account.
+    """
+
+    def __init__(
+        self,
+        action_timeout: float = 10.0,
+        dedup_ttl: float = 60.0,
+        event_buffer: int = 1024,
+    ):
+        self.action_timeout = action_timeout
+        self.event_buffer = event_buffer
+        self.connections: list[NapcatConnection] = []
+        self.deduplicator = EventDeduplicator(dedup_ttl)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def connect(self, websocket: WebSocket) -> NapcatConnection:
+        await websocket.accept()
+        raw_self_id = websocket.headers.get("x-self-id", "")
+        self_id = int(raw_self_id) if raw_self_id.isdigit() else None
+        connection = NapcatConnection(
+            websocket, self_id, self.action_timeout, self.event_buffer
+        )
+        for old in self.connections:
+            if self_id is not None and old.self_id == self_id:
+                # 同一账号重连时替换旧连接
+                self.connections.remove(old)
+                old._fail_pending("Replaced by a new connection.")
+                break
+        self.connections.append(connection)
+        CONNECTIONS.set(len(self.connections))
+        log("[*] Napcat account %s connected.", self_id)
+        # 读取任务先于 get_group_list 启动，才能收到它的响应
+        connection.start()
+        task = asyncio.create_task(self._load_groups(connection))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return connection
+
+    async def _load_groups(self, connection: NapcatConnection):
+        try:
+            groups = await connection.refresh_groups()
+            log(
+                "[*] Napcat account %s is in %s groups.",
+                connection.self_id,
+                len(groups),
+            )
+        except Exception as e:
+            log(
+                "[-] Failed to get group list of account %s: %s",
+                connection.self_id,
+                e,
+                level="warning",
+            )
+
+    def unregister(self, connection: NapcatConnection):
+        if connection in self.connections:
+            self.connections.remove(connection)
+            CONNECTIONS.set(len(self.connections))
+        connection.stop()
+        connection._fail_pending("Websocket connection is closed.")
+        log("[*] Napcat account %s disconnected.", connection.self_id)
+
+    async def disconnect(self):
+        for connection in self.connections:
+            await connection.disconnect()
+        self.connections.clear()
+        CONNECTIONS.set(0)
+
+    def is_duplicate(self, event: dict[str, Any], self_id: int | None = None) -> bool:
+        return self.deduplicator.is_duplicate(event, self_id)
+
+    def reachable(self, group_id: int) -> list[NapcatConnection]:
+        return [c for c in self.connections if c.healthy and c.can_reach(group_id)]
+
+    def _candidates(
+        self, group_id: int, via: int | None = None
+    ) -> list[NapcatConnection]:
+        candidates = self.reachable(group_id)
+        if not candidates:
+            # 尚未获知群列表时，尝试所有健康连接，最后才尝试不健康的连接
+            candidates = [c for c in self.connections if c.healthy]
+        candidates.sort(key=lambda c: (c.self_id != via, c.in_flight))
+        rest = [c for c in self.connections if c not in candidates]
+        return candidates + rest
+
+    async def send_group_msg(
+        self,
+        group_id: int,
+        message: str | None = None,
+        raw_message: list[dict[str, Any]] | None = None,
+        via: int | None = None,
+    ) -> SendGroupMsgResponse:
+        candidates = self._candidates(group_id, via)
+        if not candidates:
             raise ClientIsClosedException("Websocket connection is not established.")
-        data = await self.connection.receive_json()
-        return data
+        last_error: Exception | None = None
+        for connection in candidates:
+            try:
+                return await connection.send_group_msg(
+                    group_id, message=message, raw_message=raw_message
+                )
+            except (ClientIsClosedException, ActionTimeoutException) as e:
+                # 连接异常时改用下一个账号发送；平台拒绝发送则不重试
+                last_error = e
+        raise last_error  # type: ignore
+
+    async def get_status(self) -> dict[int | None, GetStatusResponse]:
+        results = await asyncio.gather(
+            *(c.get_status() for c in self.connections), return_exceptions=True
+        )
+        return {
+            c.self_id: r
+            for c, r in zip(self.connections, results)
+            if isinstance(r, GetStatusResponse)
+        }
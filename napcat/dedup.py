@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class EventDeduplicator:
+    """
+    Remembers recently seen group messages for `ttl` seconds. When several
+    bot accounts sit in the same group, each of them delivers the same
+    message, and only the first copy should be handled.
+
+    Each message is remembered together with the account that delivered it
+    first. Only a copy from another account is a duplicate, so the same text
+    sent twice within a second still reaches the handler twice.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        # key -> (首次收到的时间, 首次送达的账号)
+        self._seen: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    @staticmethod
+    def key(event: dict[str, Any]) -> Hashable:
+        # message_id 由各账号自行分配，不能用于跨账号去重
+        return (
+            event.get("group_id"),
+            event.get("user_id"),
+            event.get("time"),
+            event.get("raw_message"),
+        )
+
+    def is_duplicate(self, event: dict[str, Any], self_id: Any = None) -> bool:
+        """
+        Whether another account already delivered `event`. `self_id` is the
+        receiving account, taken from the event when not given.
+        """
+        if self_id is None:
+            self_id = event.get("self_id")
+        now = time.monotonic()
+        while self._seen:
+            oldest, (seen_at, _) = next(iter(self._seen.items()))
+            if now - seen_at < self.ttl:
+                break
+            del self._seen[oldest]
+        key = self.key(event)
+        seen = self._seen.get(key)
+        if seen is not None:
+            return seen[1] != self_id
+        self._seen[key] = (now, self_id)
+        return False
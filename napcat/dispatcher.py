@@ -0,0 +1,86 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from utils.logger import log
+from utils.metrics import counter, gauge
+
+DISPATCH_PENDING = gauge(
+    "dispatcher_pending_events", "Inbound events queued or being handled."
+)
+DISPATCH_HANDLED = counter(
+    "dispatcher_handled_events_total", "Inbound events handled.", ("result",)
+)
+
+
+class MessageDispatcher:
+    """
+    Decouples the websocket receive loop from command handling.
+
+    Events are queued per lane (the group id), and a fixed pool of workers
+    handles them. A lane is only held by one worker at a time, so events of
+    the same group are handled in order, while a slow command only delays
+    its own group. Once `max_pending` events are queued, `submit` waits,
+    which stops the receive loop from reading further.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[dict[str, Any]], Awaitable[None]],
+        workers: int = 8,
+        max_pending: int = 256,
+    ):
+        self.handle = handle
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        self._lanes: dict[Hashable, deque[dict[str, Any]]] = {}
+        self._ready: asyncio.Queue[Hashable] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self.pending = 0
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, lane: Hashable, event: dict[str, Any]):
+        await self._slots.acquire()
+        self.pending += 1
+        DISPATCH_PENDING.inc()
+        queue = self._lanes.get(lane)
+        if queue is None:
+            # 该 lane 当前没有排队或处理中的事件，交给空闲 worker
+            self._lanes[lane] = deque([event])
+            self._ready.put_nowait(lane)
+        else:
+            queue.append(event)
+
+    async def _worker(self):
+        while True:
+            lane = await self._ready.get()
+            queue = self._lanes[lane]
+            event = queue.popleft()
+            try:
+                await self.handle(event)
+                DISPATCH_HANDLED.inc(result="ok")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                DISPATCH_HANDLED.inc(result="error")
+                log("[-] Error while handling event: %s", e, level="error")
+            finally:
+                self._slots.release()
+                self.pending -= 1
+                DISPATCH_PENDING.dec()
+                if queue:
+                    self._ready.put_nowait(lane)
+                else:
+                    del self._lanes[lane]
@@ -13,3 +13,8 @@ class SendMsgFailedException(NapcatException):
 class ClientIsClosedException(NapcatException):
     def __init__(self, message: str):
         super().__init__(message)
+
+
+class ActionTimeoutException(NapcatException):
+    def __init__(self, message: str):
+        super().__init__(message)
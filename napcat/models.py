@@ -13,7 +13,7 @@ class SendGroupMsgRespData(BaseModel):
 class SendGroupMsgResponse(BaseModel):
     status: Literal["ok", "error"]
     retcode: int
-    data: SendGroupMsgRespData
+    data: SendGroupMsgRespData | None = None
     message: str
     wording: str
     echo: str | None = None
@@ -28,7 +28,21 @@ class GetStatusRespData(BaseModel):
 class GetStatusResponse(BaseModel):
     status: Literal["ok", "error"]
     retcode: int
-    data: GetStatusRespData
+    data: GetStatusRespData | None = None
     message: str
     wording: str
     echo: str
+
+
+class GroupInfo(BaseModel):
+    group_id: int
+    group_name: str = ""
+
+
+class GetGroupListResponse(BaseModel):
+    status: Literal["ok", "error"]
+    retcode: int
+    data: list[GroupInfo] | None = None
+    message: str = ""
+    wording: str = ""
+    echo: str | None = None
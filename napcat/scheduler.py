@@ -0,0 +1,236 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Literal
+
+from utils.logger import log
+from utils.metrics import counter, gauge, histogram
+
+Priority = Literal["notice", "reply"]
+SendCallable = Callable[[int, list[dict[str, Any]], int | None], Awaitable[Any]]
+
+OUTBOUND_QUEUE_DEPTH = gauge(
+    "napcat_outbound_queue_depth",
+    "Messages waiting in the outbound scheduler.",
+    ("priority",),
+)
+OUTBOUND_WAIT = histogram(
+    "napcat_outbound_wait_seconds",
+    "Time a message spent queued before being sent.",
+    ("priority",),
+)
+OUTBOUND_SEND = histogram(
+    "napcat_outbound_send_seconds",
+    "Time spent sending one message to Napcat.",
+    ("priority",),
+)
+OUTBOUND_MERGED = counter(
+    "napcat_outbound_merged_notices_total",
+    "Notices merged into an earlier notice message instead of sent alone.",
+)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # 能发送到该群的账号数，每个账号各有一份发送额度
+        self.scale = 1
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.burst * self.scale,
+            self.tokens + (now - self.updated) * self.rate * self.scale,
+        )
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / (self.rate * self.scale)
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Outgoing:
+    __slots__ = ("message", "via", "future", "enqueued")
+
+    def __init__(self, message: list[dict[str, Any]] | str, via: int | None = None):
+        self.message = message
+        self.via = via
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued = time.monotonic()
+
+
+class _GroupOutbox:
+    def __init__(self, rate: float, burst: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.notices: list[_Outgoing] = []
+        self.replies: deque[_Outgoing] = deque()
+        self.notice_deadline = 0.0
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class OutboundScheduler:
+    """
+    Sits between callers and Napcat and paces outgoing group messages.
+
+    Every group has a token bucket of `burst` messages refilled at `rate`
+    messages per second. Notices are held for `coalesce_window` seconds and
+    every notice of the same group queued in the meantime is sent as one
+    message. Whenever a token frees up, due notices go out before command
+    replies. `submit` returns a future resolved with the result of the send.
+
+    `capacity`, if given, returns how many bot accounts can send to a group;
+    the bucket of that group is scaled accordingly.
+    """
+
+    def __init__(
+        self,
+        send: SendCallable,
+        rate: float = 0.5,
+        burst: int = 3,
+        coalesce_window: float = 2.0,
+        max_batch: int = 10,
+        capacity: Callable[[int], int] | None = None,
+    ):
+        self.send = send
+        self.capacity = capacity
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self._outboxes: dict[int, _GroupOutbox] = {}
+
+    def depth(self) -> int:
+        return sum(len(o.notices) + len(o.replies) for o in self._outboxes.values())
+
+    def submit(
+        self,
+        group_id: int,
+        message: str | None = None,
+        raw_message: list[dict[str, Any]] | None = None,
+        priority: Priority = "reply",
+        via: int | None = None,
+    ) -> asyncio.Future:
+        if not message and not raw_message:
+            raise ValueError("Either 'message' or 'raw_message' must be provided.")
+        outbox = self._outboxes.get(group_id)
+        if outbox is None:
+            outbox = self._outboxes[group_id] = _GroupOutbox(self.rate, self.burst)
+        if outbox.task is None:
+            outbox.task = asyncio.create_task(self._run(group_id, outbox))
+        if priority == "notice" and raw_message is None:
+            item = _Outgoing(message)  # type: ignore
+            if not outbox.notices:
+                outbox.notice_deadline = time.monotonic() + self.coalesce_window
+            outbox.notices.append(item)
+        else:
+            item = _Outgoing(
+                raw_message
+                if raw_message is not None
+                else [{"type": "text", "data": {"text": message}}],
+                via,
+            )
+            outbox.replies.append(item)
+        OUTBOUND_QUEUE_DEPTH.inc(priority=priority)
+        outbox.wakeup.set()
+        return item.future
+
+    async def stop(self):
+        tasks = [o.task for o in self._outboxes.values() if o.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for outbox in self._outboxes.values():
+            outbox.task = None
+            for item in [*outbox.notices, *outbox.replies]:
+                item.future.cancel()
+            outbox.notices.clear()
+            outbox.replies.clear()
+        OUTBOUND_QUEUE_DEPTH.set(0, priority="notice")
+        OUTBOUND_QUEUE_DEPTH.set(0, priority="reply")
+
+    async def _wait(self, outbox: _GroupOutbox, timeout: float | None):
+        outbox.wakeup.clear()
+        try:
+            await asyncio.wait_for(outbox.wakeup.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    async def _run(self, group_id: int, outbox: _GroupOutbox):
+        while True:
+            if not outbox.notices and not outbox.replies:
+                await self._wait(outbox, None)
+                continue
+            notice_wait = (
+                outbox.notice_deadline - time.monotonic() if outbox.notices else None
+            )
+            notice_due = notice_wait is not None and notice_wait <= 0
+            if not notice_due and not outbox.replies:
+                await self._wait(outbox, notice_wait)
+                continue
+            if self.capacity is not None:
+                outbox.bucket.scale = max(1, self.capacity(group_id))
+            delay = outbox.bucket.delay()
+            if delay > 0:
+                # 令牌耗尽期间到达的公告会继续合并进同一条消息
+                await asyncio.sleep(delay)
+                continue
+            outbox.bucket.take()
+            if notice_due:
+                batch = outbox.notices[: self.max_batch]
+                del outbox.notices[: self.max_batch]
+                if outbox.notices:
+                    outbox.notice_deadline = time.monotonic()
+                OUTBOUND_MERGED.inc(len(batch) - 1)
+                text = "\n\n".join(item.message for item in batch)  # type: ignore
+                await self._deliver(
+                    group_id,
+                    [{"type": "text", "data": {"text": text}}],
+                    batch,
+                    "notice",
+                    None,
+                )
+            else:
+                item = outbox.replies.popleft()
+                await self._deliver(
+                    group_id,
+                    item.message,  # type: ignore
+                    [item],
+                    "reply",
+                    item.via,
+                )
+
+    async def _deliver(
+        self,
+        group_id: int,
+        message: list[dict[str, Any]],
+        items: list[_Outgoing],
+        priority: Priority,
+        via: int | None,
+    ):
+        started = time.monotonic()
+        OUTBOUND_QUEUE_DEPTH.dec(len(items), priority=priority)
+        for item in items:
+            OUTBOUND_WAIT.observe(started - item.enqueued, priority=priority)
+        try:
+            result = await self.send(group_id, message, via)
+        except Exception as e:
+            log(
+                "[-] Failed to send message to group %s: %s", group_id, e, level="error"
+            )
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_result(result)
+        OUTBOUND_SEND.observe(time.monotonic() - started, priority=priority)
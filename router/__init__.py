@@ -1,8 +1,22 @@
+import asyncio
 import inspect
+import time
 from typing import Any, Callable, Dict, Union, Awaitable
 
 from a1platform.client import PlatformClient
 from napcat.client import NapcatWebsocketServer
+from utils.metrics import counter, histogram
+
+COMMAND_LATENCY = histogram(
+    "router_command_seconds",
+    "Time to produce the reply to a command.",
+    ("command",),
+)
+COMMANDS = counter(
+    "router_commands_total",
+    "Commands handled by outcome.",
+    ("command", "result"),
+)
 
 HandlerReturn = Union[str, None]
 Handler = Callable[
@@ -12,16 +26,28 @@ Handler = Callable[
 
 class Router:
     handlers: dict[str, Handler]
+    timeouts: dict[str, float | None]
+    names: dict[str, str]
 
     def __init__(
-        self, platform: PlatformClient, napcat: NapcatWebsocketServer, *prefixes: str
+        self,
+        platform: PlatformClient,
+        napcat: NapcatWebsocketServer,
+        *prefixes: str,
+        default_timeout: float | None = None,
     ) -> None:
         self.handlers = {}
+        self.timeouts = {}
+        # 别名 -> 第一个注册的指令名，用作指标标签
+        self.names = {}
         self.platform = platform
         self.napcat = napcat
         self.prefixes = prefixes
+        self.default_timeout = default_timeout
 
-    def register(self, *command: str) -> Callable[[Handler], Handler]:
+    def register(
+        self, *command: str, timeout: float | None = None
+    ) -> Callable[[Handler], Handler]:
         for cmd in command:
             if cmd in self.handlers:
                 raise KeyError
@@ -29,6 +55,8 @@ class Router:
         def callback(handler: Handler) -> Handler:
             for cmd in command:
                 self.handlers[cmd] = handler
+                self.timeouts[cmd] = timeout
+                self.names[cmd] = command[0]
             return handler
 
         return callback
@@ -51,18 +79,32 @@ class Router:
         handler = self.handlers.get(cmd)
 
         if handler:
+            name = self.names.get(cmd, cmd)
+            started = time.perf_counter()
+            outcome = "ok"
             try:
                 result = handler(params, context)
                 if inspect.isawaitable(result):
-                    return await result
+                    timeout = self.timeouts.get(cmd) or self.default_timeout
+                    return await asyncio.wait_for(result, timeout)
                 else:
                     return result
+            except TimeoutError:
+                from utils.logger import log
+
+                outcome = "timeout"
+                log("[-] Command %s timed out", cmd, level="warning")
+                return "指令执行超时，请稍后再试！"
             except Exception as e:
                 from utils.logger import log
                 import traceback
 
+                outcome = "error"
                 traceback.print_exc()
-                log(f"[-] Error executing {cmd}: {e}", level="error")
+                log("[-] Error executing %s: %s", cmd, e, level="error")
                 return f"执行指令出错: {e}"
+            finally:
+                COMMAND_LATENCY.observe(time.perf_counter() - started, command=name)
+                COMMANDS.inc(command=name, result=outcome)
 
         return None
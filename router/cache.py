@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from utils.metrics import counter
+
+RENDER_CACHE_REQUESTS = counter(
+    "render_cache_requests_total",
+    "Rendered reply lookups by command and outcome.",
+    ("command", "result"),
+)
+
+
+class RenderCache:
+    """
+    LRU cache of rendered replies keyed by (command, normalized params,
+    snapshot version). When a command is rendered against a new snapshot
+    version, every entry of that command rendered from an older snapshot is
+    dropped at once.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, Hashable, Hashable], str] = OrderedDict()
+        self._versions: dict[str, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self, command: str | None = None):
+        if command is None:
+            self._entries.clear()
+            self._versions.clear()
+            return
+        for key in [key for key in self._entries if key[0] == command]:
+            del self._entries[key]
+        self._versions.pop(command, None)
+
+    def get_or_render(
+        self,
+        command: str,
+        params: Hashable,
+        version: Hashable,
+        render: Callable[[], str],
+    ) -> str:
+        if self._versions.get(command, version) != version:
+            self.invalidate(command)
+        self._versions[command] = version
+        key = (command, params, version)
+        result = self._entries.get(key)
+        # 指令键形如 rank@3，标签只保留指令部分
+        label = command.partition("@")[0]
+        if result is not None:
+            self.hits += 1
+            RENDER_CACHE_REQUESTS.inc(command=label, result="hit")
+            self._entries.move_to_end(key)
+            return result
+        self.misses += 1
+        RENDER_CACHE_REQUESTS.inc(command=label, result="miss")
+        result = render()
+        self._entries[key] = result
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return result
@@ -0,0 +1,630 @@
+import asyncio
+import dotenv
+import os
+import json
+import time
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import PlainTextResponse
+from typing import Any
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+
+from utils.captcha import shutdown_solver_pool
+from utils.logger import Payload, log, should_log_payload
+from utils.looplag import LoopLagMonitor
+from utils.metrics import CONTENT_TYPE, register_collector, render_prometheus
+from utils.polling import AdaptivePollScheduler
+from napcat.client import NapcatWebsocketServer
+from napcat.dispatcher import MessageDispatcher
+from napcat.scheduler import OutboundScheduler
+from a1platform.client import PlatformClient
+from a1platform.exception import PlatformException
+from a1platform.transport import TransportConfig
+from a1platform.snapshot import (
+    ChallengeCache,
+    ChallengeSnapshot,
+    ScoreboardCache,
+    ScoreboardSnapshot,
+)
+from storage import NoticeStorage
+from storage.sqlite import SqliteNoticeStorage
+from router import Router
+from router.cache import RenderCache
+from context.constant import HELP_MSG, RANK_MAPPING, ABOUT_MSG
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log("[+] Start launching A1CTF Journalist...")
+
+    for game in GAMES.values():
+        try:
+            await asyncio.to_thread(game.storage.load)
+            log("[*] Successfully loaded config and cache of game %s.", game.game_id)
+        except Exception as e:
+            log("[-] Failed to load config and cache of game %s: %s", game.game_id, e)
+        game.notice_task = asyncio.create_task(notice_check(game))
+        game.client.start_background_refresh()
+    log("[*] Background notice_check tasks started for %s game(s).", len(GAMES))
+    LOOP_LAG_MONITOR.start()
+    DISPATCHER.start()
+
+    yield
+
+    log("[+] Shutting down A1CTF Journalist...")
+
+    await DISPATCHER.stop()
+    await OUTBOX.stop()
+    await LOOP_LAG_MONITOR.stop()
+    # 共用的 AsyncClient 由第一个比赛的客户端持有，最后关闭
+    for game in reversed(GAMES.values()):
+        await game.client.stop_background_refresh()
+        if game.notice_task is not None:
+            game.notice_task.cancel()
+            try:
+                await game.notice_task
+            except asyncio.CancelledError:
+                log(
+                    "[*] Background notice_check task of game %s cancelled.",
+                    game.game_id,
+                )
+        await game.storage.flush()
+        await asyncio.to_thread(game.storage.close)
+        await game.client.close()
+    await asyncio.to_thread(shutdown_solver_pool)
+    log("[*] Longest event loop stall: %.3fs", LOOP_LAG_MONITOR.max_lag)
+
+
+APPLICATION = FastAPI(lifespan=lifespan)
+NAPCAT_SERVER = NapcatWebsocketServer()
+
+ENV = dotenv.load_dotenv()
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+
+
+def parse_list(raw: str) -> list[str]:
+    # 支持 JSON 数组或逗号分隔两种写法
+    if raw.startswith("[") and raw.endswith("]"):
+        return [str(item) for item in json.loads(raw)]
+    return [item.strip() for item in raw.split(",")]
+
+
+target_groups: list[str] = parse_list(os.getenv("TARGET_GROUPS", ""))
+BASE_URL: str = os.getenv("PLATFORM_URL", "")
+GAME_IDS: list[str] = [
+    game_id
+    for game_id in parse_list(os.getenv("PLATFORM_LISTENING_GAME_ID", ""))
+    if game_id
+]
+GAME_ID: str = GAME_IDS[0] if GAME_IDS else ""
+PLATFORM_TRANSPORT = TransportConfig(
+    connect_timeout=float(os.getenv("PLATFORM_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("PLATFORM_READ_TIMEOUT", "30")),
+    max_connections=int(os.getenv("PLATFORM_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("PLATFORM_MAX_KEEPALIVE", "10")),
+    http2=os.getenv("PLATFORM_HTTP2", "false").lower() in ("1", "true", "yes"),
+    retries=int(os.getenv("PLATFORM_RETRIES", "2")),
+)
+# 比赛 -> 播报公告的群，未配置的比赛播报到 TARGET_GROUPS 中的所有群
+GAME_GROUPS: dict[str, list[str]] = {
+    str(game_id): [str(group) for group in groups]
+    for game_id, groups in json.loads(os.getenv("GAME_GROUPS", "") or "{}").items()
+}
+# 群 -> 指令未指定比赛时使用的比赛
+GROUP_DEFAULT_GAMES: dict[str, str] = {
+    str(group): str(game_id)
+    for group, game_id in json.loads(
+        os.getenv("GROUP_DEFAULT_GAMES", "") or "{}"
+    ).items()
+}
+USERNAME: str = os.getenv("PLATFORM_USERNAME", "")
+PASSWORD: str = os.getenv("PLATFORM_PASSWORD", "")
+COOKIE: str = os.getenv("PLATFORM_COOKIE", "")
+raw_captcha_workers = os.getenv("CAPTCHA_WORKERS", "")
+CAPTCHA_WORKERS: int | None = int(raw_captcha_workers) if raw_captcha_workers else None
+REFRESH_MODE = os.getenv("PLATFORM_REFRESH_MODE", "inline")
+SCOREBOARD_REFRESH_INTERVAL = int(os.getenv("SCOREBOARD_REFRESH_INTERVAL", "0"))
+CHALLENGES_REFRESH_INTERVAL = int(os.getenv("CHALLENGES_REFRESH_INTERVAL", "0"))
+SCOREBOARD_PAGE_SIZE = int(os.getenv("SCOREBOARD_PAGE_SIZE", "0"))
+SCOREBOARD_CONCURRENCY = int(os.getenv("SCOREBOARD_CONCURRENCY", "4"))
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")
+if PARSE_EXECUTOR not in ("inline", "thread", "process"):
+    PARSE_EXECUTOR = "thread"
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", "256"))
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "30"))
+SEND_RATE = float(os.getenv("SEND_RATE", "0.5"))
+SEND_BURST = int(os.getenv("SEND_BURST", "3"))
+NOTICE_COALESCE_WINDOW = float(os.getenv("NOTICE_COALESCE_WINDOW", "2"))
+NOTICE_STORAGE_BACKEND = os.getenv("NOTICE_STORAGE", "file")
+NOTICE_RETENTION_DAYS = float(os.getenv("NOTICE_RETENTION_DAYS", "0"))
+NOTICE_SINCE_PARAM = os.getenv("NOTICE_SINCE_PARAM", "")
+NOTICE_POLL_MIN_INTERVAL = float(os.getenv("NOTICE_POLL_MIN_INTERVAL", "3"))
+NOTICE_POLL_MAX_INTERVAL = float(os.getenv("NOTICE_POLL_MAX_INTERVAL", "30"))
+NOTICE_POLL_FOLLOW_GAME = os.getenv("NOTICE_POLL_FOLLOW_GAME", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+if BASE_URL == "" or GAME_ID == "":
+    raise PlatformException(
+        "PLATFORM_URL and PLATFORM_LISTENING_GAME_ID must be set in environment variables."
+    )
+# 所有比赛共用同一个客户端的连接池与登录状态
+PLATFORM_CLIENT = PlatformClient(
+    BASE_URL,
+    GAME_ID,
+    USERNAME,
+    PASSWORD,
+    COOKIE,
+    captcha_workers=CAPTCHA_WORKERS,
+    refresh_mode="background" if REFRESH_MODE == "background" else "inline",
+    scoreboard_refresh_interval=SCOREBOARD_REFRESH_INTERVAL or None,
+    challenges_refresh_interval=CHALLENGES_REFRESH_INTERVAL or None,
+    scoreboard_page_size=SCOREBOARD_PAGE_SIZE,
+    scoreboard_concurrency=SCOREBOARD_CONCURRENCY,
+    parse_executor=PARSE_EXECUTOR,  # type: ignore
+    notice_since_param=NOTICE_SINCE_PARAM or None,
+    transport=PLATFORM_TRANSPORT,
+)
+
+
+class Game:
+    """A monitored game with its own caches, notice store, polling and groups."""
+
+    def __init__(self, game_id: str, client: PlatformClient, groups: list[str]):
+        self.game_id = game_id
+        self.name = ""
+        self.client = client
+        self.groups = groups
+        # 第一个比赛沿用原有的文件名，便于从单比赛部署升级
+        suffix = "" if game_id == GAME_ID else f"-{game_id}"
+        self.storage: NoticeStorage | SqliteNoticeStorage
+        if NOTICE_STORAGE_BACKEND == "sqlite":
+            self.storage = SqliteNoticeStorage(
+                f"notices{suffix}.db",
+                game_id=game_id,
+                retention_days=NOTICE_RETENTION_DAYS,
+                legacy_filename=f"notices{suffix}.json",
+            )
+        else:
+            self.storage = NoticeStorage(f"notices{suffix}.json")
+        self.poll_scheduler = AdaptivePollScheduler(
+            min_interval=NOTICE_POLL_MIN_INTERVAL,
+            max_interval=NOTICE_POLL_MAX_INTERVAL,
+            name=game_id,
+        )
+        self.notice_task: asyncio.Task | None = None
+
+    @property
+    def label(self) -> str:
+        return self.name or self.game_id
+
+
+GAMES: dict[str, Game] = {
+    game_id: Game(
+        game_id,
+        PLATFORM_CLIENT if game_id == GAME_ID else PLATFORM_CLIENT.for_game(game_id),
+        [g for g in GAME_GROUPS.get(game_id, target_groups) if g],
+    )
+    for game_id in GAME_IDS
+}
+LISTENING_GROUPS: set[str] = {g for g in target_groups if g} | {
+    group for game in GAMES.values() for group in game.groups
+}
+LOOP_LAG_MONITOR = LoopLagMonitor()
+
+
+@register_collector
+def collect_game_metrics():
+    for game in GAMES.values():
+        game.client.collect_cache_metrics()
+
+
+OUTBOX = OutboundScheduler(
+    lambda group_id, message, via: NAPCAT_SERVER.send_group_msg(
+        group_id=group_id, raw_message=message, via=via
+    ),
+    rate=SEND_RATE,
+    burst=SEND_BURST,
+    coalesce_window=NOTICE_COALESCE_WINDOW,
+    capacity=lambda group_id: len(NAPCAT_SERVER.reachable(group_id)),
+)
+router = Router(
+    PLATFORM_CLIENT,
+    NAPCAT_SERVER,
+    "!!",
+    "！！",
+    default_timeout=COMMAND_TIMEOUT or None,
+)
+
+
+RENDER_CACHE = RenderCache()
+
+
+@lru_cache(maxsize=8)
+def _format_timestamp(dt: datetime | None) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S") if dt else "未知"
+
+
+def default_game(group_id: int) -> Game:
+    game_id = GROUP_DEFAULT_GAMES.get(str(group_id))
+    if game_id in GAMES:
+        return GAMES[game_id]
+    for game in GAMES.values():
+        if str(group_id) in game.groups:
+            return game
+    return GAMES[GAME_ID]
+
+
+def select_game(params: str, context: dict[str, Any]) -> tuple[Game | None, str]:
+    """
+    Picks the game a command refers to and returns it with the remaining
+    params. A leading `@<game id>` selects a game explicitly; otherwise the
+    default game of the group is used. For an unknown game id, returns None
+    and the requested id.
+    """
+    parts = params.strip().split(maxsplit=1)
+    if parts and parts[0].startswith("@"):
+        game_id = parts[0][1:]
+        if game_id not in GAMES:
+            return None, game_id
+        return GAMES[game_id], parts[1] if len(parts) > 1 else ""
+    return default_game(context.get("group_id", -1)), params
+
+
+def unknown_game_message(game_id: str) -> str:
+    games = "、".join(f"{game.game_id}（{game.label}）" for game in GAMES.values())
+    return f"未找到比赛「{game_id}」，当前监听的比赛：{games}"
+
+
+def format_last_updated(cache: ScoreboardCache | ChallengeCache) -> str:
+    # 平台暂时不可用时仍返回旧数据，但需要提示用户
+    stale = "（平台暂不可用，数据可能已过期）" if cache.stale else ""
+    return f"\n上次更新时间：{_format_timestamp(cache.last_updated)}{stale}"
+
+
+@router.register("help", "h")
+def help_handler(params: str, context: dict[str, Any]) -> str:
+    log("[*] Received !!help command with params: %s, context: %s", params, context)
+    return HELP_MSG
+
+
+def render_rank(scoreboard: ScoreboardSnapshot, start: int, end: int | None) -> str:
+    if end is None:
+        # 返回前 N 名的队伍
+        lines = [f"排行榜前 {start} 名的队伍："]
+        for idx, team in enumerate(scoreboard.teams[:start], start=1):
+            lines.append(
+                f"{RANK_MAPPING.get(team.rank, idx)} {team.team_name} - {team.score} pts"
+            )
+    else:
+        lines = [f"排行榜第 {start} 名到第 {end} 名的队伍："]
+        for team in scoreboard.teams[start - 1 : end]:
+            lines.append(
+                f"{RANK_MAPPING.get(team.rank, team.rank)} {team.team_name} - {team.score} pts"
+            )
+    return "\n".join(lines) + "\n"
+
+
+@router.register("rank", "r")
+async def rank_handler(params: str, context: dict[str, Any]) -> str:
+    log("[*] Received !!rank command with params: %s, context: %s", params, context)
+    game, params = select_game(params, context)
+    if game is None:
+        return unknown_game_message(params)
+    limit = -1
+    start = -1
+    end = -1
+    if not params:
+        log("[*] No parameters provided for !!rank command, defaulting to top 10")
+        limit = 10
+    elif params.isdigit():
+        log(
+            "[*] Numeric parameter provided for !!rank command: %s, treating as limit",
+            params,
+        )
+        limit = int(params)
+    elif ":" in params:
+        log(
+            "[*] Range parameter provided for !!rank command: %s, treating as start:end",
+            params,
+        )
+        try:
+            start_str, end_str = params.split(":")
+            start = int(start_str)
+            end = int(end_str)
+            log("[*] Parsed start: %s, end: %s for !!rank command", start, end)
+        except ValueError:
+            return "参数格式错误！请使用 !!help 获取帮助"
+    else:
+        return "参数错误！请使用 !!help 获取帮助"
+    # 获取排行榜数据，分页模式下只需要取到所需名次所在的页
+    scoreboard = await game.client.fetch_scoreboard(
+        min_teams=limit if limit != -1 else end
+    )
+    if not scoreboard or not scoreboard.teams:
+        return "排行榜数据暂不可用，请稍后再试！"
+    # 根据参数返回对应的排行榜信息，同一快照下相同参数的结果直接复用
+    if limit != -1:
+        key: tuple[int, int | None] = (limit, None)
+    elif start < 1 or end > len(scoreboard.teams) or start > end:
+        return "排名范围参数错误！请使用 !!help 获取帮助"
+    else:
+        key = (start, end)
+    result = RENDER_CACHE.get_or_render(
+        f"rank@{game.game_id}",
+        key,
+        scoreboard.version,
+        lambda: render_rank(scoreboard, *key),
+    )
+    return result + format_last_updated(game.client.scoreboard_cache)
+
+
+def render_challenges(challenges: ChallengeSnapshot, keyword: str) -> str | None:
+    if keyword == "all":
+        # 返回所有挑战的列表
+        title = "所有题目列表："
+        matched_challenges = challenges.challenges
+    else:
+        # 根据参数匹配挑战名称，没有包含关键字的题目时给出最接近的题目
+        matched_challenges = challenges.search(keyword)
+        if matched_challenges:
+            title = f"匹配「{keyword}」的题目列表："
+        else:
+            matched_challenges = challenges.suggest(keyword)
+            if not matched_challenges:
+                return None
+            title = f"未找到匹配「{keyword}」的题目，以下是名称最接近的题目："
+    lines = [title]
+    for challenge in matched_challenges:
+        lines.append(
+            f"[{challenge.category}] {challenge.challenge_name}: {challenge.cur_score} pts ({challenge.solve_count} solved)"
+        )
+    return "\n".join(lines) + "\n"
+
+
+@router.register("challenge", "c")
+async def challenge_handler(params: str, context: dict[str, Any]) -> str:
+    log(
+        "[*] Received !!challenge command with params: %s, context: %s", params, context
+    )
+    game, params = select_game(params, context)
+    if game is None:
+        return unknown_game_message(params)
+    keyword = params.strip()
+    if not keyword:
+        return "参数错误！请使用 !!help 获取帮助"
+    challenges = await game.client.fetch_challenges()
+    if not challenges:
+        return "题目数据暂不可用，请稍后再试！"
+    if keyword.lower() == "all":
+        keyword = "all"
+    result = RENDER_CACHE.get_or_render(
+        f"challenge@{game.game_id}",
+        keyword,
+        challenges.version,
+        lambda: render_challenges(challenges, keyword) or "",
+    )
+    if not result:
+        return f"未找到匹配「{keyword}」的题目，请检查名称是否正确！"
+    return result + format_last_updated(game.client.challenges_cache)
+
+
+def render_team(
+    scoreboard: ScoreboardSnapshot, challenges: ChallengeSnapshot, team_name: str
+) -> str:
+    matched_team = scoreboard.find_team(team_name)
+    if not matched_team:
+        suggestions = scoreboard.suggest_teams(team_name)
+        if suggestions:
+            names = "\n".join(f"- {t.team_name}" for t in suggestions)
+            return f"未找到队伍「{team_name}」，你要找的是不是：\n{names}"
+        return f"未找到队伍「{team_name}」，请检查名称是否正确！"
+    lines = [
+        f"队伍 {matched_team.team_name} 当前得分：{matched_team.score} pts",
+        "解题情况：",
+    ]
+    for solve in matched_team.solved_challenges:
+        challenge_category = challenges.category_of(solve.challenge_id)
+        lines.append(
+            f"- [{challenge_category}] {solve.challenge_name} ({solve.score} pts for No.{solve.rank} solve)"
+        )
+    return "\n".join(lines) + "\n"
+
+
+@router.register("team", "t")
+async def team_handler(params: str, context: dict[str, Any]) -> str:
+    log("[*] Received !!team command with params: %s, context: %s", params, context)
+    game, params = select_game(params, context)
+    if game is None:
+        return unknown_game_message(params)
+    if not params.strip():
+        return "未提供队伍名称，请使用 !!help 获取帮助"
+    team_name = params.strip()
+    scoreboard = await game.client.fetch_scoreboard()
+    challenges = await game.client.fetch_challenges()
+    if not scoreboard or not scoreboard.teams:
+        return "排行榜数据暂不可用，请稍后再试！"
+    if not challenges:
+        return "题目数据暂不可用，请稍后再试！"
+    return RENDER_CACHE.get_or_render(
+        f"team@{game.game_id}",
+        team_name.casefold(),  # 与 find_team 一致，大小写不同的查询共用一份结果
+        (scoreboard.version, challenges.version),
+        lambda: render_team(scoreboard, challenges, team_name),
+    )
+
+
+@router.register("about")
+def about_handler(params: str, context: dict[str, Any]) -> str:
+    log("[*] Received !!about command with params: %s, context: %s", params, context)
+    return ABOUT_MSG
+
+
+async def handle_group_message(data: dict[str, Any]):
+    sender_id: int = data["user_id"]
+    message_id: int = data["message_id"]
+    group_id: int = data["group_id"]
+    self_id: int | None = data.get("self_id")
+    message_list = data.get("message", [])
+    # 正常获取到了消息内容
+    if message_list:
+        parsed_message: list[str] = []
+        for message in message_list:
+            if message.get("type") == "text":
+                parsed_message.append(message.get("data", {}).get("text", ""))  # type: ignore
+        result_message = await router.feed(
+            " ".join(parsed_message),
+            {
+                "sender_id": sender_id,
+                "message_id": message_id,
+                "group_id": group_id,
+            },
+        )
+        log("[*] Generated result message: %s", Payload(result_message))
+        if result_message:
+            # 不在此等待发送结果，以免占用 DISPATCHER 的处理名额；失败由 OUTBOX 记录
+            reply = OUTBOX.submit(
+                group_id,
+                raw_message=[
+                    {"type": "reply", "data": {"id": message_id}},
+                    {"type": "at", "data": {"qq": sender_id}},
+                    {"type": "text", "data": {"text": "\n"}},
+                    {"type": "text", "data": {"text": result_message}},
+                ],
+                # 引用的 message_id 只在收到该消息的账号内有效，因此由该账号回复
+                via=self_id,
+            )
+            reply.add_done_callback(_consume_result)
+
+
+def _consume_result(future: asyncio.Future):
+    # 取出异常，避免未等待的 Future 在回收时报告 "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+DISPATCHER = MessageDispatcher(
+    handle_group_message, workers=DISPATCH_WORKERS, max_pending=DISPATCH_QUEUE_SIZE
+)
+
+
+@APPLICATION.websocket("/ws")
+async def websocket(ws: WebSocket):
+    connection = await NAPCAT_SERVER.connect(ws)
+    try:
+        while True:
+            # 接收循环只负责解析与入队，指令由 DISPATCHER 的 worker 并发处理
+            data = await connection.receive_json()
+            # 每个事件都会经过这里，原始数据只在 DEBUG 级别下抽样截断记录
+            if should_log_payload():
+                log("[*] Caught napcat data: %s", Payload(data), level="DEBUG")
+            sender_id: int = data.get("user_id", -1)
+            message_id: int = data.get("message_id", -1)
+            group_id: int = data.get("group_id", -1)
+            log(
+                "[*] Parsed sender_id: %s, message_id: %s, group_id: %s",
+                sender_id,
+                message_id,
+                group_id,
+                level="DEBUG",
+            )
+            if sender_id == -1 or message_id == -1 or group_id == -1:
+                continue
+            if str(group_id) not in LISTENING_GROUPS:
+                continue
+            # 多个账号在同一个群时，同一条消息只处理一次
+            data.setdefault("self_id", connection.self_id)
+            if NAPCAT_SERVER.is_duplicate(data, data["self_id"]):
+                continue
+            # 同一群的消息按到达顺序处理；队列已满时在此等待，不再继续读取
+            await DISPATCHER.submit(group_id, data)
+    finally:
+        NAPCAT_SERVER.unregister(connection)
+
+
+@APPLICATION.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type=CONTENT_TYPE)
+
+
+async def deliver_notices(game: Game):
+    # 每条公告同时发往所有目标群，某个群发送失败或较慢不影响其他群；
+    # 失败的群会在下次检查时重试，已送达的群不会重复发送
+    sending = [
+        (notice, group)
+        for notice, groups in game.storage.undelivered()
+        for group in groups
+    ]
+    if not sending:
+        return
+    # 同时监听多个比赛时，在公告前标明比赛
+    prefix = f"[{game.label}]\n" if len(GAMES) > 1 else ""
+    results = await asyncio.gather(
+        *(
+            OUTBOX.submit(int(group), message=f"{prefix}{notice}", priority="notice")
+            for notice, group in sending
+        ),
+        return_exceptions=True,
+    )
+    for (notice, group), result in zip(sending, results):
+        delivered = not isinstance(result, BaseException)
+        if not delivered:
+            log(
+                "[-] Failed to deliver notice %s of game %s to group %s: %s",
+                notice.notice_id,
+                game.game_id,
+                group,
+                result,
+                level="warning",
+            )
+        game.storage.record_delivery(notice.notice_id, group, delivered)
+
+
+async def refresh_game_window(game: Game):
+    try:
+        info = await game.client.fetch_game_info()
+    except Exception as e:
+        log("[-] Failed to fetch info of game %s: %s", game.game_id, e, level="warning")
+        return
+    if info is not None:
+        game.name = info.name
+        game.poll_scheduler.set_game_window(info.start_time, info.end_time)
+        log("[*] Game %s window: %s - %s", game.label, info.start_time, info.end_time)
+
+
+async def notice_check(game: Game):
+    game_window_checked = float("-inf")  # 启动后立即获取一次
+    while True:
+        # 比赛时间可能被调整，定期重新获取
+        if NOTICE_POLL_FOLLOW_GAME and time.monotonic() - game_window_checked > 3600:
+            game_window_checked = time.monotonic()
+            await refresh_game_window(game)
+        started = time.perf_counter()
+        try:
+            log("[*] Checking for new notices of game %s...", game.game_id)
+            # 只处理比已记录的最大 notice_id 更新的公告
+            new_notices = await game.client.fetch_notice(
+                after=game.storage.high_water_mark()
+            )
+            found = 0
+            if new_notices:
+                for notice in new_notices:
+                    if not game.storage.is_seen(notice.notice_id):
+                        log("[*] New notice found: %s", notice)
+                        game.storage.track(notice, game.groups)
+                        found += 1
+            else:
+                log("[*] No new notices found.")
+            await deliver_notices(game)
+            # 只写入本轮新增的记录
+            await game.storage.flush()
+            game.poll_scheduler.record_success(found, time.perf_counter() - started)
+        except Exception as e:
+            log("[-] Error while checking notices of game %s: %s", game.game_id, e)
+            game.poll_scheduler.record_error(time.perf_counter() - started)
+        # 有新公告时加快检查，长时间没有新公告时逐渐放慢，出错时指数退避
+        await asyncio.sleep(game.poll_scheduler.next_delay())
@@ -1,13 +1,25 @@
+import asyncio
+import json
+import os
 from datetime import datetime
+from typing import Any
 from pydantic import BaseModel
 
 from context.path import get_workdir
 from a1platform.models import Notice
+from utils.logger import log
+
+
+class Delivery(BaseModel):
+    delivered: bool = False
+    attempts: int = 0
 
 
 class NoticeFileStorage(BaseModel):
     last_updated: datetime = datetime.now()
     notices: list[Notice] = list()
+    # notice_id -> 群号 -> 投递状态，只包含公告首次出现时配置的群
+    deliveries: dict[int, dict[str, Delivery]] = dict()
 
     def append(self, notice: Notice):
         self.notices.append(notice)
@@ -18,9 +30,82 @@ class NoticeFileStorage(BaseModel):
 
 
 class NoticeStorage:
-    def __init__(self, filename: str):
+    """
+    Notices are kept in a snapshot file (`filename`, the NoticeFileStorage
+    JSON document) plus an append-only journal (`filename.journal`, one JSON
+    record per line) holding the changes made since the snapshot.
+
+    Changes are buffered in memory and `flush` appends them to the journal
+    with a single fsync. Once the journal holds `compact_threshold` records,
+    the snapshot is rewritten and the journal emptied. On startup the
+    journal is replayed on top of the snapshot; a torn last line left by a
+    crash is dropped.
+    """
+
+    def __init__(
+        self, filename: str, max_attempts: int = 5, compact_threshold: int = 1000
+    ):
         self.path = get_workdir() / filename
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
         self.notices: NoticeFileStorage = NoticeFileStorage()
+        self.max_attempts = max_attempts
+        self.compact_threshold = compact_threshold
+        self._seen: set[int] = set()
+        self._by_id: dict[int, Notice] = {}
+        # 仍有群未送达且未达到重试次数上限的公告
+        self._pending: set[int] = set()
+        self._buffer: list[str] = []
+        self._journal_records = 0
+        self._lock = asyncio.Lock()
+        self._high_water_mark = 0
+
+    def _index(self):
+        self._by_id = {notice.notice_id: notice for notice in self.notices.notices}
+        self._seen = set(self._by_id)
+        self._high_water_mark = max(self._seen, default=0)
+        self._pending = {
+            notice_id
+            for notice_id, deliveries in self.notices.deliveries.items()
+            if not self._settled(deliveries)
+        }
+
+    def _settled(self, deliveries: dict[str, Delivery]) -> bool:
+        return all(
+            d.delivered or d.attempts >= self.max_attempts for d in deliveries.values()
+        )
+
+    def _apply(self, record: dict[str, Any]):
+        match record.get("type"):
+            case "notice":
+                notice = Notice.model_validate(record["notice"])
+                if notice.notice_id in self._seen:
+                    return
+                self._seen.add(notice.notice_id)
+                self._high_water_mark = max(self._high_water_mark, notice.notice_id)
+                self._by_id[notice.notice_id] = notice
+                self.notices.append(notice)
+                self.notices.deliveries[notice.notice_id] = {
+                    group: Delivery() for group in record.get("groups", [])
+                }
+                if record.get("groups"):
+                    self._pending.add(notice.notice_id)
+            case "delivery":
+                deliveries = self.notices.deliveries.get(record["notice_id"], {})
+                delivery = deliveries.get(record["group"])
+                if delivery is None:
+                    return
+                # 记录保存的是绝对值，重复回放（如 save 中途崩溃）也不会重复计数
+                if "attempts" in record:
+                    delivery.attempts = record["attempts"]
+                else:
+                    delivery.attempts += 1
+                delivery.delivered = record["delivered"]
+                if self._settled(deliveries):
+                    self._pending.discard(record["notice_id"])
+
+    def _record(self, record: dict[str, Any]):
+        self._apply(record)
+        self._buffer.append(json.dumps(record, ensure_ascii=False, default=str))
 
     def load(self):
         try:
@@ -28,15 +113,116 @@ class NoticeStorage:
                 self.notices = NoticeFileStorage.model_validate_json(f.read())
         except FileNotFoundError:
             self.notices = NoticeFileStorage()
-            with open(self.path, "w") as f:
-                f.write(self.notices.model_dump_json(indent=4))
+            self._write_snapshot()
+        self._index()
+        self._buffer.clear()
+        self._journal_records = 0
+        self._replay()
 
-    def save(self):
-        with open(self.path, "w") as f:
+    def _replay(self):
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
+            return
+        # 每条记录都以换行结尾，最后一段没有换行说明写入中途崩溃，直接丢弃
+        valid = 0
+        for line in lines[:-1]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            self._apply(record)
+            self._journal_records += 1
+            valid += len(line) + 1
+        if valid < sum(len(line) + 1 for line in lines) - 1:
+            log(
+                "[-] Dropping torn records at the end of %s",
+                self.journal_path,
+                level="warning",
+            )
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(valid)
+
+    def _write_snapshot(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
             f.write(self.notices.model_dump_json(indent=4))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append_journal(self, lines: list[str]):
+        with open(self.journal_path, "a") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self):
+        """Rewrites the snapshot with everything in memory and empties the journal."""
+        self._write_snapshot()
+        with open(self.journal_path, "w"):
+            pass
+        self._buffer.clear()
+        self._journal_records = 0
+
+    async def flush(self):
+        """Appends the buffered changes to the journal, compacting it when it gets long."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._append_journal, lines)
+            self._journal_records += len(lines)
+            if self._journal_records >= self.compact_threshold:
+                await asyncio.to_thread(self.save)
+
+    def close(self):
+        self.save()
 
     def is_seen(self, notice_id: int) -> bool:
-        return any(notice.notice_id == notice_id for notice in self.notices.notices)
+        return notice_id in self._seen
+
+    def high_water_mark(self) -> int:
+        """The highest notice id recorded so far, 0 if there is none."""
+        return self._high_water_mark
+
+    def track(self, notice: Notice, groups: list[str]):
+        """Records a new notice and the groups it has to be delivered to."""
+        self._record(
+            {
+                "type": "notice",
+                "notice": notice.model_dump(mode="json"),
+                "groups": groups,
+            }
+        )
+
+    def undelivered(self) -> list[tuple[Notice, list[str]]]:
+        """Notices with groups that have not received them yet and are still retried."""
+        pending = []
+        for notice_id in sorted(self._pending):
+            groups = [
+                group
+                for group, delivery in self.notices.deliveries[notice_id].items()
+                if not delivery.delivered and delivery.attempts < self.max_attempts
+            ]
+            if groups:
+                pending.append((self._by_id[notice_id], groups))
+        return pending
+
+    def record_delivery(self, notice_id: int, group: str, delivered: bool):
+        delivery = self.notices.deliveries.get(notice_id, {}).get(group)
+        if delivery is None:
+            return
+        self._record(
+            {
+                "type": "delivery",
+                "notice_id": notice_id,
+                "group": group,
+                "delivered": delivered,
+                "attempts": delivery.attempts + 1,
+            }
+        )
 
     def __repr__(self):
         return f"NoticeStorage(path={self.path}, notices={self.notices})"
@@ -44,6 +230,7 @@ class NoticeStorage:
 
 if __name__ == "__main__":
     storage = NoticeStorage("notices.json")
+    storage.load()
     notice = Notice(
         notice_id=1,
         notice_category="FirstBlood",
@@ -51,5 +238,5 @@ if __name__ == "__main__":
         create_time="2025-08-15T02:00:16.975239Z",  # type: ignore
         category="Pwn",
     )
-    storage.notices.append(notice)
-    storage.save()
+    storage.track(notice, [])
+    asyncio.run(storage.flush())
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from context.path import get_workdir
+from a1platform.models import Notice
+from storage import NoticeStorage
+from utils.logger import log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notices (
+    game_id TEXT NOT NULL,
+    notice_id INTEGER NOT NULL,
+    notice_category TEXT NOT NULL,
+    category TEXT,
+    create_time TEXT NOT NULL,
+    data TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (game_id, notice_id)
+);
+CREATE INDEX IF NOT EXISTS notices_category ON notices (game_id, notice_category);
+CREATE INDEX IF NOT EXISTS notices_stored_at ON notices (stored_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    game_id TEXT NOT NULL,
+    notice_id INTEGER NOT NULL,
+    group_id TEXT NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (game_id, notice_id, group_id)
+);
+CREATE INDEX IF NOT EXISTS deliveries_pending
+    ON deliveries (game_id, notice_id) WHERE delivered = 0;
+CREATE TABLE IF NOT EXISTS pruned (
+    game_id TEXT PRIMARY KEY,
+    max_notice_id INTEGER NOT NULL
+);
+"""
+
+
+class SqliteNoticeStorage:
+    """
+    NoticeStorage backed by SQLite in WAL mode. Only the rows a call needs
+    are read, so memory use does not grow with the number of notices.
+
+    Changes are written as soon as they are made and committed together by
+    `flush`, which runs in a worker thread. With `retention_days` set,
+    delivered notices older than that are deleted; the highest pruned id is
+    remembered so that pruned notices still count as seen.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        game_id: str = "",
+        max_attempts: int = 5,
+        retention_days: float = 0,
+        legacy_filename: str | None = "notices.json",
+    ):
+        self.path = get_workdir() / filename
+        self.legacy_path = get_workdir() / legacy_filename if legacy_filename else None
+        self.game_id = game_id
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self._db: sqlite3.Connection | None = None
+        # 连接会在事件循环线程与 flush 的工作线程之间共用
+        self._lock = threading.Lock()
+        self._pruned_below = 0
+        self._last_prune = 0.0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            raise RuntimeError("SqliteNoticeStorage.load() has not been called.")
+        return self._db
+
+    def load(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        self._db = db
+        row = db.execute(
+            "SELECT max_notice_id FROM pruned WHERE game_id = ?", (self.game_id,)
+        ).fetchone()
+        self._pruned_below = row[0] if row else 0
+        self._migrate()
+        db.execute("BEGIN")
+
+    def _migrate(self):
+        if self.legacy_path is None or not self.legacy_path.exists():
+            return
+        # 通过 NoticeStorage 读取，未压缩进快照的日志记录也会一并迁移
+        storage = NoticeStorage(self.legacy_path.name)
+        storage.load()
+        legacy = storage.notices
+        with self._lock:
+            self.db.execute("BEGIN")
+            for notice in legacy.notices:
+                deliveries = legacy.deliveries.get(notice.notice_id, {})
+                self._insert(notice, list(deliveries))
+                for group, delivery in deliveries.items():
+                    self.db.execute(
+                        "UPDATE deliveries SET delivered = ?, attempts = ?"
+                        " WHERE game_id = ? AND notice_id = ? AND group_id = ?",
+                        (
+                            delivery.delivered,
+                            delivery.attempts,
+                            self.game_id,
+                            notice.notice_id,
+                            group,
+                        ),
+                    )
+            self.db.execute("COMMIT")
+        # 迁移只进行一次，旧文件改名保留
+        for path in (storage.path, storage.journal_path):
+            if path.exists():
+                os.replace(path, path.with_name(path.name + ".migrated"))
+        log(
+            "[*] Migrated %s notices from %s to %s",
+            len(legacy.notices),
+            self.legacy_path,
+            self.path,
+        )
+
+    def _insert(self, notice: Notice, groups: list[str]):
+        self.db.execute(
+            "INSERT OR IGNORE INTO notices VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.game_id,
+                notice.notice_id,
+                notice.notice_category,
+                notice.category,
+                notice.create_time.isoformat(),
+                json.dumps(notice.data, ensure_ascii=False),
+                time.time(),
+            ),
+        )
+        self.db.executemany(
+            "INSERT OR IGNORE INTO deliveries (game_id, notice_id, group_id)"
+            " VALUES (?, ?, ?)",
+            [(self.game_id, notice.notice_id, group) for group in groups],
+        )
+
+    async def flush(self):
+        """Commits the changes made since the last flush."""
+        if self._db is not None:
+            await asyncio.to_thread(self.save)
+
+    def save(self):
+        """Commits pending changes, applying the retention policy at most hourly."""
+        with self._lock:
+            now = time.time()
+            if self.retention_days > 0 and now - self._last_prune >= 3600:
+                self._prune(now - self.retention_days * 86400)
+                self._last_prune = now
+            self.db.execute("COMMIT")
+            self.db.execute("BEGIN")
+
+    def _prune(self, cutoff: float):
+        row = self.db.execute(
+            "SELECT MAX(notice_id) FROM notices n WHERE game_id = ? AND stored_at < ?"
+            " AND NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.game_id = n.game_id"
+            " AND d.notice_id = n.notice_id AND d.delivered = 0 AND d.attempts < ?)",
+            (self.game_id, cutoff, self.max_attempts),
+        ).fetchone()
+        if not row or row[0] is None:
+            return
+        pruned_below = max(self._pruned_below, row[0])
+        # 仍在重试投递的公告保留，其余不超过 pruned_below 的公告全部删除
+        self.db.execute(
+            "DELETE FROM notices AS n WHERE game_id = ? AND notice_id <= ?"
+            " AND NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.game_id = n.game_id"
+            " AND d.notice_id = n.notice_id AND d.delivered = 0 AND d.attempts < ?)",
+            (self.game_id, pruned_below, self.max_attempts),
+        )
+        self.db.execute(
+            "DELETE FROM deliveries WHERE game_id = ? AND notice_id <= ?"
+            " AND notice_id NOT IN (SELECT notice_id FROM notices WHERE game_id = ?)",
+            (self.game_id, pruned_below, self.game_id),
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO pruned VALUES (?, ?)", (self.game_id, pruned_below)
+        )
+        self._pruned_below = pruned_below
+
+    def close(self):
+        if self._db is not None:
+            self.save()
+            with self._lock:
+                self.db.execute("COMMIT")
+                self.db.close()
+            self._db = None
+
+    def is_seen(self, notice_id: int) -> bool:
+        if notice_id <= self._pruned_below:
+            return True
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM notices WHERE game_id = ? AND notice_id = ?",
+                (self.game_id, notice_id),
+            ).fetchone()
+        return row is not None
+
+    def high_water_mark(self) -> int:
+        """The highest notice id recorded so far, 0 if there is none."""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT MAX(notice_id) FROM notices WHERE game_id = ?", (self.game_id,)
+            ).fetchone()
+        return max(self._pruned_below, row[0] or 0)
+
+    def track(self, notice: Notice, groups: list[str]):
+        """Records a new notice and the groups it has to be delivered to."""
+        with self._lock:
+            self._insert(notice, groups)
+
+    def undelivered(self) -> list[tuple[Notice, list[str]]]:
+        """Notices with groups that have not received them yet and are still retried."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT n.notice_id, n.notice_category, n.category, n.create_time,"
+                " n.data, d.group_id FROM deliveries d JOIN notices n"
+                " ON n.game_id = d.game_id AND n.notice_id = d.notice_id"
+                " WHERE d.game_id = ? AND d.delivered = 0 AND d.attempts < ?"
+                " ORDER BY d.notice_id",
+                (self.game_id, self.max_attempts),
+            ).fetchall()
+        pending: dict[int, tuple[Notice, list[str]]] = {}
+        for notice_id, notice_category, category, create_time, data, group in rows:
+            if notice_id not in pending:
+                notice = Notice(
+                    notice_id=notice_id,
+                    notice_category=notice_category,
+                    category=category,
+                    create_time=create_time,
+                    data=json.loads(data),
+                )
+                pending[notice_id] = (notice, [])
+            pending[notice_id][1].append(group)
+        return list(pending.values())
+
+    def record_delivery(self, notice_id: int, group: str, delivered: bool):
+        with self._lock:
+            self.db.execute(
+                "UPDATE deliveries SET delivered = ?, attempts = attempts + 1"
+                " WHERE game_id = ? AND notice_id = ? AND group_id = ?",
+                (delivered, self.game_id, notice_id, group),
+            )
+
+    def __repr__(self):
+        return f"SqliteNoticeStorage(path={self.path}, game_id={self.game_id})"
@@ -1,6 +1,32 @@
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils.logger import log
+import os
+import sys
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from utils.processes import process_context
+
+# 每个分片包含的 nonce 数量，以及 worker 检查取消标记的间隔
+CHUNK_SIZE = 1 << 15
+CANCEL_CHECK_INTERVAL = 1 << 12
+
+# nonce 的十进制低三位表：高位为 0 时不补零，否则补零到三位
+_LOW_BLOCK = 1000
+_PLAIN_LOWS = tuple(str(i).encode("ascii") for i in range(_LOW_BLOCK))
+_PADDED_LOWS = tuple(f"{i:03d}".encode("ascii") for i in range(_LOW_BLOCK))
+
+# 子进程内共享的「已解出」标记，由 _init_worker 注入。进程池跨多次求解复用，
+# 每个元素记录该位置的题目在哪一轮求解中已解出
+_solved_flags = None
+# 进程池初始容纳的题目数，题目更多时重建进程池
+FLAG_CAPACITY = 256
 
 
 def fnv1a(data_str: str) -> int:
@@ -41,42 +67,254 @@ def prng(seed: str, length: int) -> str:
     return result[:length]
 
 
-def solve_pow(salt: str, target: str) -> int:
+def _solve_pow_naive(salt: str, target: str, start: int, stop: int) -> int | None:
     """
-    Solves the proof-of-work challenge. It iteratively tries different 'nonce'
-    values until it finds a SHA-256 hash that starts with the 'target' string.
+    Reference implementation that hashes `salt + str(nonce)` from scratch and
+    compares hex digests. Kept for the benchmark and as a correctness oracle.
     """
-    nonce = 0
-    while True:
+    for nonce in range(start, stop):
         attempt = salt + str(nonce)
         h = hashlib.sha256(attempt.encode("utf-8")).hexdigest()
         if h.startswith(target):
             return nonce
-        nonce += 1
+    return None
 
 
-def solve_challenge(challenge_token: str, c: int, s: int, d: int) -> list[int]:
+def _compile_target(target: str) -> tuple[bytes, int, int]:
     """
-    This is the main function that orchestrates the solving of the CAPTCHA.
-    It generates all the necessary challenges and uses a thread pool to solve
-    them in parallel, which significantly speeds up the process.
+    Converts a hex target prefix into (full_bytes, nibble_index, nibble) so it
+    can be checked against the raw digest. nibble_index is -1 for targets of
+    even length.
+    """
+    full = len(target) // 2
+    prefix = bytes.fromhex(target[: full * 2])
+    if len(target) % 2:
+        return prefix, full, int(target[-1], 16)
+    return prefix, -1, 0
 
-    Args:
-        challenge_token: The token from the /api/cap/challenge endpoint.
-        c: The number of challenges to solve.
-        s: The salt size.
-        d: The difficulty (length of the target prefix).
 
-    Returns:
-        A list of nonces, one for each solved challenge.
+def solve_pow_range(salt: str, target: str, start: int, stop: int) -> int | None:
     """
+    Searches the nonce range [start, stop) for a solution of the proof-of-work
+    challenge. Returns the first matching nonce, or None if the range has none.
+
+    The salt is hashed once and its state copied for every nonce. A nonce is
+    split into a decimal high part, hashed once per block of 1000 nonces, and
+    a 3-digit low part taken from a precomputed table, so the hot loop never
+    formats integers or hex digests.
+    """
+    try:
+        prefix, nibble_index, nibble = _compile_target(target)
+    except ValueError:
+        return _solve_pow_naive(salt, target, start, stop)
+
+    base = hashlib.sha256(salt.encode("utf-8"))
+    high, low = divmod(start, _LOW_BLOCK)
+    while True:
+        block_start = high * _LOW_BLOCK
+        if block_start >= stop:
+            return None
+        if high:
+            mid = base.copy()
+            mid.update(str(high).encode("ascii"))
+            table = _PADDED_LOWS
+        else:
+            mid = base
+            table = _PLAIN_LOWS
+        for low in range(low, min(_LOW_BLOCK, stop - block_start)):
+            h = mid.copy()
+            h.update(table[low])
+            digest = h.digest()
+            if digest.startswith(prefix) and (
+                nibble_index < 0 or digest[nibble_index] >> 4 == nibble
+            ):
+                return block_start + low
+        high += 1
+        low = 0
+
+
+def solve_pow(salt: str, target: str) -> int:
+    """
+    Solves the proof-of-work challenge. It iteratively tries different 'nonce'
+    values until it finds a SHA-256 hash that starts with the 'target' string.
+    """
+    nonce = solve_pow_range(salt, target, 0, sys.maxsize)
+    if nonce is None:
+        raise ValueError(f"No solution found for target {target}")
+    return nonce
+
+
+def _init_worker(flags) -> None:
+    global _solved_flags
+    _solved_flags = flags
+
+
+def _solve_pow_shard(
+    round_id: int, index: int, salt: str, target: str, start: int, stop: int
+) -> int | None:
+    """
+    Worker entry for the process pool. The range is scanned in small steps so
+    that the worker gives up as soon as another shard has solved the same
+    challenge in the same round.
+    """
+    flags = _solved_flags
+    for step_start in range(start, stop, CANCEL_CHECK_INTERVAL):
+        if flags is not None and flags[index] == round_id:
+            return None
+        step_stop = min(step_start + CANCEL_CHECK_INTERVAL, stop)
+        nonce = solve_pow_range(salt, target, step_start, step_stop)
+        if nonce is not None:
+            if flags is not None:
+                flags[index] = round_id
+            return nonce
+    return None
+
+
+def _generate_challenges(challenge_token: str, c: int, s: int, d: int):
     challenges = []
     for i in range(1, c + 1):
         salt = prng(f"{challenge_token}{i}", s)
         target = prng(f"{challenge_token}{i}d", d)
         challenges.append((salt, target))
+    return challenges
 
-    results = [0] * c
+
+class _SolverPool:
+    """
+    Process pool kept across logins, so that the workers are started once
+    rather than on every captcha. Solves are serialized by a lock; each one
+    uses a new round id, so flags left over from earlier rounds are ignored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._flags = None
+        self._workers = 0
+        self._round = 0
+
+    def _ensure(self, workers: int, size: int) -> ProcessPoolExecutor:
+        if (
+            self._executor is not None
+            and self._workers == workers
+            and len(self._flags) >= size  # type: ignore
+        ):
+            return self._executor
+        self._shutdown()
+        ctx = process_context()
+        self._flags = ctx.RawArray("q", max(FLAG_CAPACITY, size))
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self._flags,),
+        )
+        self._workers = workers
+        return self._executor
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown()
+
+    def solve(
+        self, challenges: list[tuple[str, str]], workers: int, chunk_size: int
+    ) -> list[int]:
+        with self._lock:
+            executor = self._ensure(workers, len(challenges))
+            self._round += 1
+            try:
+                return self._solve(executor, challenges, workers, chunk_size)
+            except Exception:
+                # 进程池损坏（如 worker 被杀死）时丢弃，下次求解时重建
+                self._shutdown()
+                raise
+
+    def _solve(
+        self,
+        executor: ProcessPoolExecutor,
+        challenges: list[tuple[str, str]],
+        workers: int,
+        chunk_size: int,
+    ) -> list[int]:
+        """
+        Shards the nonce space of every challenge into ranges of `chunk_size`
+        and keeps all worker processes busy with them. Once a shard finds a
+        hit, the remaining shards of that challenge are cancelled (queued ones
+        through the future, running ones through the shared flag array).
+        """
+        flags = self._flags
+        round_id = self._round
+        results: list[int | None] = [None] * len(challenges)
+        next_start = [0] * len(challenges)
+        pending: dict[Future, int] = {}
+
+        def submit_next() -> bool:
+            # 优先给在途分片最少的未解题目分配新的分片
+            unsolved = [i for i, r in enumerate(results) if r is None]
+            if not unsolved:
+                return False
+            in_flight = [0] * len(challenges)
+            for index in pending.values():
+                in_flight[index] += 1
+            index = min(unsolved, key=lambda i: (in_flight[i], i))
+            salt, target = challenges[index]
+            start = next_start[index]
+            next_start[index] = start + chunk_size
+            future = executor.submit(
+                _solve_pow_shard,
+                round_id,
+                index,
+                salt,
+                target,
+                start,
+                start + chunk_size,
+            )
+            pending[future] = index
+            return True
+
+        try:
+            for _ in range(workers * 2):
+                submit_next()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    if future.cancelled():
+                        continue
+                    nonce = future.result()
+                    if nonce is not None and results[index] is None:
+                        results[index] = nonce
+                        flags[index] = round_id  # type: ignore
+                        for other, other_index in list(pending.items()):
+                            if other_index == index and other.cancel():
+                                pending.pop(other)
+                while len(pending) < workers * 2 and submit_next():
+                    pass
+        finally:
+            # 出错时让仍在运行的分片尽快退出，不占用下一轮的 worker
+            for index in range(len(challenges)):
+                flags[index] = round_id  # type: ignore
+            for future in pending:
+                future.cancel()
+
+        return [r if r is not None else 0 for r in results]
+
+
+_SOLVER_POOL = _SolverPool()
+
+
+def shutdown_solver_pool():
+    """Stops the worker processes kept for solving captchas."""
+    _SOLVER_POOL.shutdown()
+
+
+def _solve_with_threads(challenges: list[tuple[str, str]]) -> list[int]:
+    results = [0] * len(challenges)
     with ThreadPoolExecutor() as executor:
         # Create a mapping from future to its index to maintain order
         future_to_index = {
@@ -89,6 +327,87 @@ def solve_challenge(challenge_token: str, c: int, s: int, d: int) -> list[int]:
                 nonce = future.result()
                 results[index] = nonce
             except Exception as exc:
-                log(f"Challenge {index} generated an exception: {exc}")
+                from utils.logger import log
+
+                log("Challenge %s generated an exception: %s", index, exc)
 
     return results
+
+
+def solve_challenge(
+    challenge_token: str,
+    c: int,
+    s: int,
+    d: int,
+    workers: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> list[int]:
+    """
+    This is the main function that orchestrates the solving of the CAPTCHA.
+    It generates all the necessary challenges and shards their nonce spaces
+    across a process pool, so that hashing is not serialized by the GIL.
+
+    Args:
+        challenge_token: The token from the /api/cap/challenge endpoint.
+        c: The number of challenges to solve.
+        s: The salt size.
+        d: The difficulty (length of the target prefix).
+        workers: Number of worker processes, defaults to the CPU count.
+            A value of 0 or 1 uses the thread pool path instead.
+        chunk_size: Number of nonces per shard handed to a worker.
+
+    Returns:
+        A list of nonces, one for each solved challenge, in challenge order.
+    """
+    challenges = _generate_challenges(challenge_token, c, s, d)
+    if workers is None:
+        workers = os.process_cpu_count() or 1
+    if workers > 1:
+        try:
+            return _SOLVER_POOL.solve(challenges, workers, chunk_size)
+        except (OSError, NotImplementedError, RuntimeError) as exc:
+            # worker 进程会导入本模块，日志模块只在主进程中按需导入
+            from utils.logger import log
+
+            # 某些受限环境无法创建子进程，回退到线程池
+            log("[-] Process pool unavailable, falling back to threads: %s", exc)
+    return _solve_with_threads(challenges)
+
+
+def _benchmark_engine(solver, challenges: list[tuple[str, str]]) -> tuple[int, float]:
+    hashes = 0
+    started = time.perf_counter()
+    for salt, target in challenges:
+        nonce = solver(salt, target, 0, sys.maxsize)
+        hashes += nonce + 1
+    return hashes, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.captcha [c,s,d ...]，例如 python -m utils.captcha 50,32,4
+    cases = [tuple(int(v) for v in arg.split(",")) for arg in sys.argv[1:]] or [
+        (18, 32, 4),
+        (50, 32, 4),
+        (8, 32, 5),
+    ]
+    for c, s, d in cases:
+        challenges = _generate_challenges(f"benchmark-{c}-{s}-{d}", c, s, d)
+        print(f"c={c} s={s} d={d}")
+        rate = 0.0
+        for name, solver in (
+            ("naive", _solve_pow_naive),
+            ("midstate", solve_pow_range),
+        ):
+            hashes, elapsed = _benchmark_engine(solver, challenges)
+            rate = hashes / elapsed if elapsed else 0.0
+            print(
+                f"  {name:<9} {hashes:>10} hashes  {elapsed:8.3f} s  {rate:>12,.0f} H/s"
+            )
+        started = time.perf_counter()
+        solve_challenge(f"benchmark-{c}-{s}-{d}", c, s, d)
+        elapsed = time.perf_counter() - started
+        expected = c * 16**d
+        print(
+            f"  solve_challenge ({os.process_cpu_count()} cpus) {elapsed:8.3f} s, "
+            f"expected single-core time ~{expected / rate if rate else 0:.1f} s"
+        )
@@ -1,14 +1,20 @@
 """简单统一日志模块。
 
-提供 `log(message, level="INFO")` 接口并支持同时输出到控制台和文件。
+提供 `log(message, *args, level="INFO")` 接口并支持同时输出到控制台和文件。
 默认输出格式：`[YYYY-MM-DD HH:MM:SS] LEVEL message`。
+
+调用方在入队时把消息与 `args` 合并成字符串，写控制台与文件由后台监听线程完成；
+`args` 按 `%` 风格延迟格式化，级别未启用时不做任何格式化。
 """
 
 from __future__ import annotations
 
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any
 
 
@@ -17,11 +23,24 @@ LOG_DIR = os.getenv("LOG_DIR", "logs")
 LOG_FILE = os.getenv("LOG_FILE", os.path.join(LOG_DIR, "app.log"))
 MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5 * 1024 * 1024))
 BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 收到的事件等大块数据的记录方式
+PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", 512))
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 1.0))
 
 os.makedirs(LOG_DIR, exist_ok=True)
 
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "WARN": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
 _logger = logging.getLogger("a1ctf_journalist")
-_logger.setLevel(logging.DEBUG)
+_logger.setLevel(_LEVELS.get(LOG_LEVEL, logging.INFO))
+_logger.propagate = False
 
 formatter = logging.Formatter(
     fmt="[%(asctime)s] %(levelname)s %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
@@ -31,7 +50,6 @@ formatter = logging.Formatter(
 ch = logging.StreamHandler()
 ch.setLevel(logging.DEBUG)
 ch.setFormatter(formatter)
-_logger.addHandler(ch)
 
 # File handler with rotation
 fh = RotatingFileHandler(
@@ -39,43 +57,79 @@ fh = RotatingFileHandler(
 )
 fh.setLevel(logging.DEBUG)
 fh.setFormatter(formatter)
-_logger.addHandler(fh)
 
 
-def log(message: Any, level: str = "INFO") -> None:
+_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+# QueueHandler 在入队时格式化消息，之后 args 被修改也不影响已记录的内容
+_logger.addHandler(QueueHandler(_queue))
+
+_listener = QueueListener(_queue, ch, fh, respect_handler_level=True)
+_listener.start()
+
+
+def shutdown() -> None:
+    """Writes out the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
+
+
+class Payload:
+    """Truncates the repr of a large object, and only when it is formatted."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int = PAYLOAD_MAX_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if self.limit <= 0 or len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}... ({len(text)} chars)"
+
+
+def is_enabled(level: str = "INFO") -> bool:
+    return _logger.isEnabledFor(_LEVELS.get((level or "INFO").upper(), logging.INFO))
+
+
+def should_log_payload(level: str = "DEBUG") -> bool:
+    """Whether a sampled payload should be logged at `level` this time."""
+    if not is_enabled(level):
+        return False
+    return PAYLOAD_SAMPLE_RATE >= 1 or random.random() < PAYLOAD_SAMPLE_RATE
+
+
+def log(message: Any, *args: Any, level: str = "INFO") -> None:
     """统一日志接口。
 
     Args:
-        message: 要记录的内容，任意类型会被转换为字符串。
+        message: 要记录的内容，任意类型会被转换为字符串；带 `args` 时作为 `%` 格式串。
+        args: 延迟格式化的参数，只有该级别启用时才会被格式化。
         level: 日志级别，支持 'DEBUG','INFO','WARNING','ERROR'. 默认为 'INFO'.
     """
-    try:
-        msg = str(message)
-    except Exception:
-        msg = repr(message)
-
-    level = (level or "INFO").upper()
-    if level == "DEBUG":
-        _logger.debug(msg)
-    elif level == "WARNING" or level == "WARN":
-        _logger.warning(msg)
-    elif level == "ERROR":
-        _logger.error(msg)
-    else:
-        _logger.info(msg)
+    levelno = _LEVELS.get((level or "INFO").upper(), logging.INFO)
+    if not _logger.isEnabledFor(levelno):
+        return
+    _logger.log(levelno, message, *args)
 
 
-def debug(message: Any) -> None:
-    log(message, level="DEBUG")
+def debug(message: Any, *args: Any) -> None:
+    log(message, *args, level="DEBUG")
 
 
-def info(message: Any) -> None:
-    log(message, level="INFO")
+def info(message: Any, *args: Any) -> None:
+    log(message, *args, level="INFO")
 
 
-def warning(message: Any) -> None:
-    log(message, level="WARNING")
+def warning(message: Any, *args: Any) -> None:
+    log(message, *args, level="WARNING")
 
 
-def error(message: Any) -> None:
-    log(message, level="ERROR")
+def error(message: Any, *args: Any) -> None:
+    log(message, *args, level="ERROR")
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from utils.metrics import gauge, histogram
+
+LOOP_LAG = histogram(
+    "event_loop_lag_seconds",
+    "Delay between the scheduled and the actual wake-up of the lag probe.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_LAG_MAX = gauge(
+    "event_loop_lag_max_seconds", "Longest event loop stall observed since start."
+)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping probe task. Any time
+    beyond the requested interval was spent running something else without
+    yielding, e.g. a synchronous parse.
+    """
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+                LOOP_LAG_MAX.set(lag)
+            LOOP_LAG.observe(lag)
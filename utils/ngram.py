@@ -0,0 +1,150 @@
+"""字符 n-gram 检索。
+
+按字符（而非按词）切分，中文名称不需要分词即可检索。索引同时保存
+单字与双字 gram：单字只用于一个字的查询，双字用于子串过滤与模糊排序。
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from collections import Counter
+from typing import Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+# 模糊匹配时用于标记名称首尾的字符，使前后缀相同的名称得分更高
+_BEGIN = "\x02"
+_END = "\x03"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class NgramIndex(Generic[T]):
+    def __init__(self, entries: Iterable[tuple[str, T]]):
+        self._keys: list[str] = []
+        self._values: list[T] = []
+        self._gram_counts: list[int] = []
+        self._postings: dict[str, list[int]] = {}
+        for key, value in entries:
+            doc = len(self._keys)
+            key = normalize(key)
+            self._keys.append(key)
+            self._values.append(value)
+            bigrams = _bigrams(f"{_BEGIN}{key}{_END}")
+            self._gram_counts.append(len(bigrams))
+            for gram in bigrams | set(key):
+                self._postings.setdefault(gram, []).append(doc)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def substring(self, query: str) -> list[T]:
+        """Returns all values whose key contains `query`, in index order."""
+        query = normalize(query)
+        if not query:
+            return []
+        grams = _bigrams(query) or {query}
+        postings = []
+        for gram in grams:
+            docs = self._postings.get(gram)
+            if not docs:
+                return []
+            postings.append(docs)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for docs in postings[1:]:
+            candidates.intersection_update(docs)
+            if not candidates:
+                return []
+        return [
+            self._values[doc] for doc in sorted(candidates) if query in self._keys[doc]
+        ]
+
+    def fuzzy(self, query: str, limit: int = 5, min_score: float = 0.4) -> list[T]:
+        """
+        Ranks values by the Dice coefficient between the bigram sets of the
+        query and the key, and returns the best `limit` ones scoring at least
+        `min_score`.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        grams = _bigrams(f"{_BEGIN}{query}{_END}")
+        postings = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+        # 得分不低于 min_score 的名称至少要命中 needed 个 gram，因此必然出现在
+        # 最稀有的 len(grams) - needed + 1 个 gram 中，其余 gram 只需统计这些候选
+        needed = max(1, math.ceil(min_score * len(grams) / (2 - min_score)))
+        prefix = len(grams) - needed + 1
+        shared: Counter[int] = Counter()
+        for docs in postings[:prefix]:
+            shared.update(docs)
+        candidates = set(shared)
+        for docs in postings[prefix:]:
+            shared.update(candidates.intersection(docs))
+        scored = (
+            (2 * count / (len(grams) + self._gram_counts[doc]), -doc)
+            for doc, count in shared.items()
+        )
+        best = heapq.nlargest(limit, scored)
+        return [self._values[-doc] for score, doc in best if score >= min_score]
+
+
+if __name__ == "__main__":
+    # 用法: python -m utils.ngram [名称数量 ...]
+    import random
+    import string
+    import sys
+    import time
+
+    random.seed(0)
+    cjk = [chr(c) for c in range(0x4E00, 0x4E00 + 400)]
+
+    def random_name() -> str:
+        parts = []
+        for _ in range(random.randint(1, 3)):
+            if random.random() < 0.3:
+                parts.append("".join(random.choices(cjk, k=random.randint(2, 4))))
+            else:
+                parts.append(
+                    "".join(
+                        random.choices(string.ascii_letters, k=random.randint(3, 8))
+                    )
+                )
+        return " ".join(parts)
+
+    def misspell(name: str) -> str:
+        i = random.randrange(len(name))
+        return name[:i] + name[i + 1 :]
+
+    for size in [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]:
+        names = [random_name() for _ in range(size)]
+        started = time.perf_counter()
+        index = NgramIndex((name, name) for name in names)
+        build = time.perf_counter() - started
+        sample = random.sample(names, 200)
+        substrings = [name[: max(2, len(name) // 2)] for name in sample]
+        typos = [misspell(name) for name in sample]
+
+        def timed(fn, queries: list[str]) -> float:
+            started = time.perf_counter()
+            for query in queries:
+                fn(query)
+            return (time.perf_counter() - started) / len(queries) * 1e6
+
+        def scan(query: str):
+            query = query.casefold()
+            return [name for name in names if query in name.casefold()]
+
+        print(f"{size} names, index build {build * 1000:.1f} ms")
+        print(f"  linear scan substring {timed(scan, substrings):9.1f} us/query")
+        print(
+            f"  index substring       {timed(index.substring, substrings):9.1f} us/query"
+        )
+        print(f"  index fuzzy (typo)    {timed(index.fuzzy, typos):9.1f} us/query")
@@ -0,0 +1,100 @@
+import random
+from datetime import datetime, timezone
+
+from utils.metrics import gauge, histogram
+
+POLL_INTERVAL = gauge(
+    "notice_poll_interval_seconds",
+    "Delay before the next notice poll.",
+    ("game",),
+)
+POLL_DURATION = histogram(
+    "notice_poll_seconds",
+    "Time taken by a notice poll, delivery included.",
+    ("game", "result"),
+)
+POLL_NEW_NOTICES = histogram(
+    "notice_poll_new_notices",
+    "New notices found by a successful poll.",
+    ("game",),
+    buckets=(0, 1, 2, 5, 10, 25, 50),
+)
+
+
+class AdaptivePollScheduler:
+    """
+    Chooses the delay before the next poll.
+
+    After a poll that found something the delay drops to `min_interval`,
+    and every empty poll multiplies it by `growth` up to `max_interval`.
+    Failed polls back off exponentially from `error_interval` up to
+    `max_error_interval`, waiting a random time between half and all of
+    the current backoff. When the game window is known, polls outside it
+    happen every `outside_interval` seconds, and the first poll after the
+    start is scheduled for the start itself.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 3.0,
+        max_interval: float = 30.0,
+        growth: float = 1.5,
+        error_interval: float = 5.0,
+        max_error_interval: float = 300.0,
+        outside_interval: float = 300.0,
+        jitter: float = 0.1,
+        name: str = "",
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+        self.error_interval = error_interval
+        self.max_error_interval = max_error_interval
+        self.outside_interval = outside_interval
+        self.jitter = jitter
+        self.name = name
+        self.interval = min_interval
+        self.errors = 0
+        self.start_time: datetime | None = None
+        self.end_time: datetime | None = None
+
+    def set_game_window(self, start_time: datetime | None, end_time: datetime | None):
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def record_success(self, new_notices: int, duration: float | None = None):
+        self.errors = 0
+        POLL_NEW_NOTICES.observe(new_notices, game=self.name)
+        if duration is not None:
+            POLL_DURATION.observe(duration, game=self.name, result="ok")
+        if new_notices:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.growth)
+
+    def record_error(self, duration: float | None = None):
+        self.errors += 1
+        if duration is not None:
+            POLL_DURATION.observe(duration, game=self.name, result="error")
+
+    def next_delay(self, now: datetime | None = None) -> float:
+        if self.errors:
+            # 指数有上限，平台长时间不可用时也不会溢出
+            exponent = min(self.errors - 1, 16)
+            ceiling = min(self.max_error_interval, self.error_interval * 2**exponent)
+            delay = random.uniform(ceiling / 2, ceiling)
+        else:
+            now = now or datetime.now(timezone.utc)
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            if self.start_time is not None and now < _aware(self.start_time):
+                # 比赛开始前低频检查，开始时立即检查
+                until_start = (_aware(self.start_time) - now).total_seconds()
+                delay = min(self.outside_interval, until_start)
+            elif self.end_time is not None and now > _aware(self.end_time):
+                delay = self.outside_interval
+        POLL_INTERVAL.set(delay, game=self.name)
+        return delay
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
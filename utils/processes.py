@@ -0,0 +1,13 @@
+import multiprocessing
+from multiprocessing.context import BaseContext
+
+
+def process_context() -> BaseContext:
+    """
+    Start method for worker pools. The bot process runs several threads
+    (uvicorn, the log listener, `asyncio.to_thread` workers), and forking
+    it may deadlock the child, so fork is never used.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")